@@ -47,6 +47,20 @@ AttrName2Ids = {v: i.replace('_PERCENT', '') for i, v in MainAttrNames.items()}
 
 TypeNames = ["生之花", "死之羽", "时之沙", "空之杯", "理之冠"]
 
+# main stats an artifact of each type (index of TypeNames) can have
+TypeMainAttrs = [
+    ["FIGHT_PROP_HP"],
+    ["FIGHT_PROP_ATTACK"],
+    ["FIGHT_PROP_ATTACK_PERCENT", "FIGHT_PROP_HP_PERCENT", "FIGHT_PROP_DEFENSE_PERCENT",
+     "FIGHT_PROP_ELEMENT_MASTERY", "FIGHT_PROP_CHARGE_EFFICIENCY"],
+    ["FIGHT_PROP_ATTACK_PERCENT", "FIGHT_PROP_HP_PERCENT", "FIGHT_PROP_DEFENSE_PERCENT",
+     "FIGHT_PROP_ELEMENT_MASTERY", "FIGHT_PROP_PHYSICAL_ADD_HURT", "FIGHT_PROP_ROCK_ADD_HURT",
+     "FIGHT_PROP_WIND_ADD_HURT", "FIGHT_PROP_ICE_ADD_HURT", "FIGHT_PROP_WATER_ADD_HURT",
+     "FIGHT_PROP_FIRE_ADD_HURT", "FIGHT_PROP_ELEC_ADD_HURT", "FIGHT_PROP_GRASS_ADD_HURT"],
+    ["FIGHT_PROP_ATTACK_PERCENT", "FIGHT_PROP_HP_PERCENT", "FIGHT_PROP_DEFENSE_PERCENT",
+     "FIGHT_PROP_ELEMENT_MASTERY", "FIGHT_PROP_CRITICAL", "FIGHT_PROP_CRITICAL_HURT", "FIGHT_PROP_HEAL_ADD"],
+]
+
 SubAttrNames = {
     "FIGHT_PROP_CRITICAL":          "暴击率",
     "FIGHT_PROP_CRITICAL_HURT":     "暴击伤害",
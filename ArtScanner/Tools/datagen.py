@@ -78,3 +78,54 @@ def generate_image(text, font_size_range=(15, 40)):
     draw.text(pos, text, forecolor, font=fonts[np.random.randint(*font_size_range)])
     draw = ImageDraw.Draw(img)
     return img
+
+
+# English lines, generated as by train_model_EN.py
+
+
+def gen_name_EN():
+    return np.random.choice(sum(ArtsInfo.ArtNames_EN, []), size=1)[0]
+
+
+def gen_type_EN():
+    return np.random.choice(ArtsInfo.TypeNames_EN, size=1)[0]
+
+
+def gen_main_attr_name_EN():
+    return np.random.choice(list(ArtsInfo.MainAttrNames_EN.values()), size=1)[0]
+
+
+def gen_single_sub_attr_EN():
+    sub_attr_id = np.random.choice(list(ArtsInfo.SubAttrNames_EN.keys()), size=1)[0]
+    rare_sub_attr_ranges = [
+        [i['PropValue'] for i in SubAttrDatabase if i['DepotId'] == j and i['PropType'] == sub_attr_id] for j in
+        [101, 201, 301, 401, 501]]
+    rare = np.random.choice(5, p=[0.0625, 0.0625, 0.125, 0.25, 0.5])
+    n_upgrades = np.random.randint(1, rare + 3)
+    sub_attr_value = np.random.choice(rare_sub_attr_ranges[rare], size=n_upgrades).sum()
+    return ArtsInfo.SubAttrNames_EN[sub_attr_id] + '+' + ArtsInfo.Formats[sub_attr_id].format(sub_attr_value)
+
+
+def generate_image_EN(text, font_size_range=(20, 45)):
+    pos = np.random.randint(0, 10), np.random.randint(0, 10)
+    backcolor = (
+        np.random.randint(150, 255),
+        np.random.randint(150, 255),
+        np.random.randint(150, 255),
+    )
+    forecolor = (
+        np.random.randint(0, 75),
+        np.random.randint(0, 75),
+        np.random.randint(0, 75),
+    )
+    img = Image.new("RGB", (770, 60), backcolor)
+    draw = ImageDraw.Draw(img)
+    if len(text) >= 35:
+        # long names wrap before their last word
+        last = text.split(" ")[-1]
+        font_size = int(np.random.randint(30, 50) / 2)
+        draw.text(pos, text[:-len(last)], forecolor, font=fonts[font_size])
+        draw.text((pos[0], pos[1] + int(font_size * 1.2)), last, forecolor, font=fonts[font_size])
+    else:
+        draw.text(pos, text, forecolor, font=fonts[np.random.randint(*font_size_range)])
+    return img
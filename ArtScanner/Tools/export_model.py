@@ -0,0 +1,147 @@
+'''
+Exports the trained OCR model to a SavedModel, ONNX and TFLite (float and int8 quantized) for the backends of
+ocr.OCR, and prints a load time / accuracy / latency / size comparison of every format on synthetic text lines.
+Run it from the Tools directory, the calibration and test lines come from datagen.py:
+
+    python export_model.py ../weights-improvement-55-1.00.hdf5 --out ../ocr
+    python export_model.py ../weights-improvement-EN-81-1.00.hdf5 --out ../ocr_EN --en
+
+then pass the ocr_saved_model directory as saved_model, or ocr.onnx / ocr_int8.tflite as model_weight of ocr.OCR.
+The scanners load ocr_saved_model (ocr_EN_saved_model) from their bundle directory when present, the build scripts
+only export that one:
+
+    python export_model.py ../weights-improvement-55-1.00.hdf5 --out ../ocr --skip onnx tflite int8 --test 0
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def synthetic_lines(model, n, seed=0, en=False):
+    '''
+    returns n random texts of every field and their preprocessed model input
+    en: English lines, for the English model
+    '''
+    import datagen
+    np.random.seed(seed)
+    if en:
+        generators = [datagen.gen_name_EN, datagen.gen_type_EN, datagen.gen_main_attr_name_EN,
+                      datagen.gen_main_attr_value, datagen.gen_level, datagen.gen_single_sub_attr_EN]
+        generate_image = datagen.generate_image_EN
+    else:
+        generators = [datagen.gen_name, datagen.gen_type, datagen.gen_main_attr_name, datagen.gen_main_attr_value,
+                      datagen.gen_level, datagen.gen_single_sub_attr]
+        generate_image = datagen.generate_image
+    texts = [generators[i % len(generators)]() for i in range(n)]
+    x = np.zeros((n, model.width, model.height, 1), np.float32)
+    for i, text in enumerate(texts):
+        x[i, :, :, 0] = model.preprocess(generate_image(text)).T
+    return texts, x
+
+
+def export_saved_model(model, path):
+    '''
+    graph, weights and vocabulary in one directory, loaded by OCR without rebuilding the model
+    '''
+    module = tf.Module()
+    module.model = model.model
+    module.infer = tf.function(lambda x: model.model(x, training=False),
+                               input_signature=[tf.TensorSpec((None, model.width, model.height, 1), tf.float32)])
+    tf.saved_model.save(module, path)
+    os.makedirs(os.path.join(path, 'assets.extra'), exist_ok=True)
+    with open(os.path.join(path, 'assets.extra', 'vocabulary.json'), 'wb') as f:
+        f.write(json.dumps({'characters': model.characters}, ensure_ascii=False).encode('utf-8'))
+
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, i)) for root, _, files in os.walk(path) for i in files)
+    return os.path.getsize(path)
+
+
+def export_onnx(keras_model, path):
+    import tf2onnx
+    spec = (tf.TensorSpec((None, *keras_model.input_shape[1:]), tf.float32, name='image'),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=13, output_path=path)
+
+
+def export_tflite(keras_model, path, calibration=None):
+    '''
+    calibration: model inputs for int8 post-training quantization, None to export a float model
+    '''
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if calibration is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([calibration[i:i + 1]] for i in range(len(calibration)))
+        # weights and activations in int8, input and output stay float so OCR feeds it like the other backends
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def evaluate(name, model, texts, x, reference=None, size=None):
+    model.warmup()
+    predicted = []
+    start = time.perf_counter()
+    for i in range(0, len(x), 9):
+        predicted += model.decode(model.infer(x[i:i + 9]))
+    elapsed = time.perf_counter() - start
+    accuracy = np.mean([p == t for p, t in zip(predicted, texts)])
+    line = f'{name:<14} accuracy {accuracy:7.2%}, {elapsed / len(x) * 1000:6.2f}ms per line'
+    if reference is not None:
+        line += f', same as keras {np.mean([p == r for p, r in zip(predicted, reference)]):7.2%}'
+    if size is not None:
+        line += f', {size / 2 ** 20:.1f}MB'
+    print(line)
+    return predicted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the OCR model and compare the formats')
+    parser.add_argument('weights', help='keras weights of the model')
+    parser.add_argument('--out', default='ocr', help='path prefix of the exported files')
+    parser.add_argument('--en', action='store_true', help='export the English model')
+    parser.add_argument('--calibration', type=int, default=500, help='number of lines for int8 calibration')
+    parser.add_argument('--test', type=int, default=1000, help='number of lines for the comparison, 0 to skip it')
+    parser.add_argument('--skip', nargs='*', default=[], choices=['savedmodel', 'onnx', 'tflite', 'int8'])
+    args = parser.parse_args()
+
+    if args.en:
+        import ocr_EN as ocr
+    else:
+        import ocr
+
+    model = ocr.OCR(model_weight=args.weights)
+    exports = []
+    if 'savedmodel' not in args.skip:
+        export_saved_model(model, args.out + '_saved_model')
+        exports.append(('savedmodel', args.out + '_saved_model'))
+    if 'onnx' not in args.skip:
+        export_onnx(model.model, args.out + '.onnx')
+        exports.append(('onnx', args.out + '.onnx'))
+    if 'tflite' not in args.skip:
+        export_tflite(model.model, args.out + '.tflite')
+        exports.append(('tflite', args.out + '.tflite'))
+    if 'int8' not in args.skip:
+        _, calibration = synthetic_lines(model, args.calibration, seed=1, en=args.en)
+        export_tflite(model.model, args.out + '_int8.tflite', calibration)
+        exports.append(('tflite int8', args.out + '_int8.tflite'))
+
+    if args.test <= 0:
+        sys.exit()
+    texts, x = synthetic_lines(model, args.test, en=args.en)
+    # a fresh keras model, the first one built in this process also paid for importing TensorFlow
+    model = ocr.OCR(model_weight=args.weights)
+    print(f'keras          loaded in {model.load_time:.2f}s')
+    reference = evaluate('keras', model, texts, x, size=size_of(args.weights))
+    for name, path in exports:
+        exported = ocr.OCR(model_weight=path)
+        print(f'{name:<14} loaded in {exported.load_time:.2f}s')
+        evaluate(name, exported, texts, x, reference, size_of(path))
@@ -1,12 +1,15 @@
 import ctypes
 import json
+import multiprocessing
 import os
 import sys
+import threading
 import time
 
 import mouse
 import win32api
 import win32gui
+from PIL import Image
 from PyQt5.QtCore import (pyqtSignal, pyqtSlot, QObject, QThread,
                           QMutex, QWaitCondition, Qt)
 from PyQt5.QtGui import (QMovie, QPixmap)
@@ -16,14 +19,18 @@ from PyQt5.QtWidgets import (QMainWindow, QApplication, QDialog, QMessageBox,
 import ocr
 import utils
 import ArtsInfo
-from art_saver import ArtDatabase
+from art_saver import ArtDatabase, infer_level
 from art_scanner_logic import ArtScannerLogic, GameInfo
+from ocr_pool import OCRPool
+from pipeline import ScanPipeline
 from rcc import About_Dialog
 from rcc import Help_Dialog
 from rcc import ExtraSettings_Dialog
 from rcc import InputWindow_Dialog
 from rcc.MainWindow import Ui_MainWindow
 
+startTime = time.time()
+
 
 class AboutDlg(QDialog, About_Dialog.Ui_Dialog):
     def __init__(self, parent=None):
@@ -73,6 +80,7 @@ class ExtraSettingsDlg(QDialog, ExtraSettings_Dialog.Ui_Dialog):
         super(ExtraSettingsDlg, self).__init__(parent)
         self.setupUi(self)
 
+        self._settings = settings
         self._checkboxes = []
 
         self.checkBox.setChecked(settings['EnhancedCaptureWindow'])
@@ -115,6 +123,7 @@ class ExtraSettingsDlg(QDialog, ExtraSettings_Dialog.Ui_Dialog):
     @pyqtSlot()
     def handleAccept(self):
         settings = {
+            **self._settings,
             "EnhancedCaptureWindow": self.checkBox.isChecked(),
             "ExportAllFormats": self.checkBox_2.isChecked(),
             "ExportAllImages": self.checkBox_5.isChecked(),
@@ -144,6 +153,12 @@ class UIMain(QMainWindow, Ui_MainWindow):
             "ExportAllFormats": False,
             "ExportAllImages": False,
             "FilterArtsByName": False,
+            "PipelinedScan": True,
+            "OCRThreads": 1,
+            "OCRBatchSize": 8,
+            "OCRProcesses": 0,
+            "PersistentOCRCache": False,
+            "RecaptureLowConfidence": 1,
             "Filter": [True for _ in ArtsInfo.SetNames],
             "TabIndex": 0
         }
@@ -377,6 +392,8 @@ class Worker(QObject):
         # in initEngine
         self.game_info = None
         self.model = None
+        self.modelArgs = None
+        self.modelThread = None
         self.bundle_dir = None
 
         # init in scanArts
@@ -396,6 +413,14 @@ class Worker(QObject):
         time.sleep(0.5)
         self.log('初始化中，请稍候...')
 
+        # TensorFlow import, model construction and warm-up run while the window is captured
+        if len(sys.argv) > 1:
+            self.bundle_dir = sys.argv[1]
+        else:
+            self.bundle_dir = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
+        self.modelThread = threading.Thread(target=self.loadModel, daemon=True)
+        self.modelThread.start()
+
         # 创建文件夹
         os.makedirs('artifacts', exist_ok=True)
         self.log('检测 DPI 设定...')
@@ -415,12 +440,8 @@ class Worker(QObject):
         self.detectGameInfo(False)
 
         self.working.emit()
-        self.log('初始化 OCR 模型...')
-        if len(sys.argv) > 1:
-            self.bundle_dir = sys.argv[1]
-        else:
-            self.bundle_dir = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
-        self.model = ocr.OCR(model_weight=os.path.join(self.bundle_dir, 'weights-improvement-55-1.00.hdf5'))
+        if self.modelThread.is_alive():
+            self.log('OCR 模型在后台加载中')
 
         self.log('初始化完成')
         if self.isWindowCaptured:
@@ -431,9 +452,37 @@ class Worker(QObject):
             self.error('窗口未捕获，请在重新捕获窗口后开始扫描')
 
         self.log('开始扫描前请打开背包 - 圣遗物，并翻页至顶部')
+        self.logger.info(f'startup: interactive after {time.time() - startTime:.2f}s')
         self.endWorking.emit()
         self.endInit.emit()
 
+    def loadModel(self):
+        '''
+        runs on a background thread: imports TensorFlow, builds the OCR model and warms it up
+        '''
+        try:
+            start = time.time()
+            # the prebuilt SavedModel of Tools/export_model.py is used when bundled
+            self.modelArgs = dict(model_weight=os.path.join(self.bundle_dir, 'weights-improvement-55-1.00.hdf5'),
+                                  saved_model=os.path.join(self.bundle_dir, 'ocr_saved_model'))
+            model = ocr.OCR(**self.modelArgs)
+            built = time.time()
+            model.warmup()
+            self.model = model
+            self.logger.info(f'startup: OCR model loaded from {model.model_source} in {built - start:.2f}s '
+                             f'(model {model.load_time:.2f}s), warmed up in {time.time() - built:.2f}s, '
+                             f'ready after {time.time() - startTime:.2f}s')
+            self.log('OCR 模型加载完成')
+        except Exception as e:
+            self.logger.exception(e)
+            self.error('OCR 模型加载失败')
+
+    def waitModel(self):
+        if self.modelThread.is_alive():
+            self.log('等待 OCR 模型加载...')
+            self.modelThread.join()
+        return self.model is not None
+
     # 捕获窗口与计算边界
     @pyqtSlot(bool)
     def detectGameInfo(self, isEnhanced: bool):
@@ -494,6 +543,11 @@ class Worker(QObject):
             self.endScan.emit('')
             self.endWorking.emit()
             return
+        if not self.waitModel():
+            self.error('OCR 模型加载失败')
+            self.endScan.emit('')
+            self.endWorking.emit()
+            return
 
         self.model.setScaleRatio(self.game_info.scale_ratio)
 
@@ -503,7 +557,13 @@ class Worker(QObject):
             self.endWorking.emit()
             return
         self.detectSettings = info
-        artifactDB = ArtDatabase()
+        if info['ExtraSettings']['PersistentOCRCache']:
+            # lines recognized in earlier scans
+            self.model.cache.load('ocr_cache.json')
+        # screenshots are compressed and written to artifacts/images by a background thread, named by their pixels
+        artifactDB = ArtDatabase(image_dir=os.path.join('artifacts', 'images'),
+                                 keep_images='all' if info['ExtraSettings']['ExportAllImages'] else 'failures',
+                                 image_size=None)
         artScanner = ArtScannerLogic(self.game_info)
 
         exporter = [artifactDB.exportGenshinArtJSON,
@@ -540,18 +600,22 @@ class Worker(QObject):
         self.star_dist_saved = [0, 0, 0, 0, 0]
 
         def autoCorrect(detected_info):
-            detected_info['name'] = utils.name_auto_correct(detected_info['name'])
-            detected_info['setid'] = [i for i, v in enumerate(
-                ArtsInfo.ArtNames) if detected_info['name'] in v][0]
-            detected_info['main_attr_name'] = utils.attr_auto_correct(detected_info['main_attr_name'])
+            # name, type and main stat have to agree on the slot of the artifact, the fields read with a high
+            # confidence (lexicon hits with a good score included) decide it
+            threshold = self.model.confidence_threshold
+            confident = {key for key, value in detected_info['confidence'].items() if value >= threshold}
+            detected_info.update(utils.art_resolve(detected_info['name'], detected_info['type'],
+                                                   detected_info['main_attr_name'], confident))
             for tag in sorted(detected_info.keys()):
                 if "subattr_" in tag:
                     info = detected_info[tag].split('+')
                     detected_info[tag] = utils.attr_auto_correct(info[0]) + "+" + info[1]
+            # the main stat pins the level when the level crop is misread
+            level = infer_level(detected_info)
+            if level is not None:
+                detected_info['level'] = f'+{level}'
 
         def artFilter(detected_info, art_img):
-            autoCorrect(detected_info)
-
             self.star_dist[detected_info['star'] - 1] += 1
             detectedLevel = utils.decodeValue(detected_info['level'])
             detectedStar = utils.decodeValue(detected_info['star'])
@@ -583,41 +647,129 @@ class Worker(QObject):
             saveImg(detected_info, art_img, status)
 
         def saveImg(detected_info, art_img, status):
-            if self.detectSettings['ExtraSettings']['ExportAllImages']:
-                if status == 3:
-                    art_img.save(f'artifacts/fail_{self.art_id}.png')
-                    s = json.dumps(detected_info, ensure_ascii=False)
-                    with open(f"artifacts/fail_{self.art_id}.json", "wb") as f:
-                        f.write(s.encode('utf-8'))
-                else:
-                    art_img.save(f'artifacts/{self.art_id}.png')
-                    s = json.dumps(detected_info, ensure_ascii=False)
-                    with open(f"artifacts/{self.art_id}.json", "wb") as f:
-                        f.write(s.encode('utf-8'))
+            # artifactDB spilled the screenshot of an artifact it kept, skipped ones are not added to it,
+            # all of them are kept with ExportAllImages, only the failures otherwise
+            if status == 3:
+                ref = artifactDB.failures[-1][1]
+            elif status == 2:
+                ref = artifactDB.images[-1]
             else:
-                # export only failed
-                if status == 3:
-                    art_img.save(f'artifacts/fail_{self.art_id}.png')
-                    s = json.dumps(detected_info, ensure_ascii=False)
-                    with open(f"artifacts/fail_{self.art_id}.json", "wb") as f:
-                        f.write(s.encode('utf-8'))
-
-        def artscannerCallback(art_img):
-            detectedInfo = self.model.detect_info(art_img)
-            artFilter(detectedInfo, art_img)
+                ref = artifactDB.spill(art_img, failed=False)
+            if ref is None:
+                return
+            s = json.dumps({**detected_info, 'image': f'images/{ref}.png'}, ensure_ascii=False)
+            with open(f"artifacts/{'fail_' if status == 3 else ''}{self.art_id}.json", "wb") as f:
+                f.write(s.encode('utf-8'))
+
+        def recognize(art_img):
+            detected_info = self.model.detect_info(art_img)
+            autoCorrect(detected_info)
+            # art_img views the capture buffer, copy it out before it is kept or saved
+            return detected_info, Image.fromarray(art_img)
+
+        def recognizeBatch(items):
+            results = ocrEngine.detect_info_batch([art_img for art_img, _ in items])
+            for detected_info in results:
+                autoCorrect(detected_info)
+            return [(detected_info, Image.fromarray(art_img), position)
+                    for detected_info, (art_img, position) in zip(results, items)]
+
+        def recaptureCallback(art_img, retries_left):
+            detected_info = self.model.detect_info(art_img)
+            if retries_left > 0 and min(detected_info['confidence'].values()) < self.model.confidence_threshold:
+                self.logger.info(f"Recapturing a low confidence read."
+                                 f" id: {self.art_id + 1} detected info: {detected_info}")
+                return False
+            autoCorrect(detected_info)
+            artscannerResult((detected_info, Image.fromarray(art_img)))
+
+        def artscannerResult(result):
+            artFilter(*result)
             self.log(f"已扫描{self.art_id}个圣遗物，已保存{self.saved}个，已跳过{self.skipped}个")
 
+        recapture = info['ExtraSettings']['RecaptureLowConfidence']
+        # (row, col) and result of the low confidence reads among the rows shown, recaptured before they are scrolled
+        lowConfidence = []
+        pageArts = 0
+
+        def submitArt(art_img):
+            nonlocal pageArts
+            position = start_row + pageArts // self.game_info.art_cols, pageArts % self.game_info.art_cols
+            pageArts += 1
+            # the scanner reuses the capture buffer, so queue a copy
+            pipeline.submit((art_img.copy(), position))
+
+        def pipelinedResult(result):
+            detected_info, art_img, position = result
+            if recapture > 0 and min(detected_info['confidence'].values()) < self.model.confidence_threshold:
+                self.logger.info(f"Recapturing a low confidence read after the rows shown."
+                                 f" position: {position} detected info: {detected_info}")
+                lowConfidence.append((position, (detected_info, art_img)))
+            else:
+                artscannerResult((detected_info, art_img))
+
+        def recapturePage():
+            # every artifact of the rows shown has to be recognized first, the first read is kept when the
+            # scan was interrupted or the artifact cannot be selected again
+            pipeline.flush()
+            for (row, col), result in lowConfidence:
+                for retries_left in reversed(range(recapture)):
+                    art_img = None if artScanner.stopped else artScanner.captureArt(row, col, as_array=True)
+                    if art_img is None:
+                        artscannerResult(result)
+                        break
+                    if recaptureCallback(art_img, retries_left) is not False:
+                        break
+            lowConfidence.clear()
+
+        pipeline = None
+        ocrEngine = self.model
+        if info['ExtraSettings']['PipelinedScan']:
+            if info['ExtraSettings']['OCRProcesses'] > 0:
+                # each worker process holds its own model, panels are passed to them through shared memory
+                ocrEngine = OCRPool(ocr.__name__, self.modelArgs, workers=info['ExtraSettings']['OCRProcesses'],
+                                    panel_shape=(int(self.game_info.art_info_height) + 1,
+                                                 int(self.game_info.art_info_width) + 1, 3))
+                ocrEngine.setScaleRatio(self.game_info.scale_ratio)
+            # keep clicking and capturing while OCR and validation run on worker threads
+            # artifacts captured while the model is busy are recognized together in one batch
+            # one thread per worker process keeps all of them busy
+            pipeline = ScanPipeline(recognizeBatch, pipelinedResult,
+                                    workers=max(info['ExtraSettings']['OCRThreads'],
+                                                info['ExtraSettings']['OCRProcesses']),
+                                    batch_size=info['ExtraSettings']['OCRBatchSize'])
+            artscannerCallback = submitArt
+        elif recapture > 0:
+            # the scanner clicks back to an artifact read with a low confidence and captures it again
+            artscannerCallback = recaptureCallback
+        else:
+            artscannerCallback = lambda art_img: artscannerResult(recognize(art_img))
+
         try:
-            while True:
-                if artScanner.stopped or not artScanner.scanRows(rows=range(start_row, self.game_info.art_rows),
-                                                                 callback=artscannerCallback) or start_row != 0:
-                    break
-                start_row = self.game_info.art_rows - artScanner.scrollToRow(self.game_info.art_rows, max_scrolls=20,
-                                                                             extra_scroll=int(
-                                                                                 self.game_info.art_rows > 5),
-                                                                             interval=self.detectSettings['delay'])
-                if start_row == self.game_info.art_rows:
-                    break
+            try:
+                while True:
+                    pageArts = 0
+                    scanned = artScanner.scanRows(rows=range(start_row, self.game_info.art_rows),
+                                                  callback=artscannerCallback,
+                                                  as_array=True,
+                                                  recapture=recapture if pipeline is None else 0)
+                    if pipeline is not None and recapture > 0:
+                        recapturePage()
+                    if artScanner.stopped or not scanned or start_row != 0:
+                        break
+                    start_row = self.game_info.art_rows - artScanner.scrollToRow(
+                        self.game_info.art_rows, max_scrolls=20, extra_scroll=int(self.game_info.art_rows > 5),
+                        interval=self.detectSettings['delay'])
+                    if start_row == self.game_info.art_rows:
+                        break
+            finally:
+                # a worker exception re-raised by the pipeline must not leak the worker processes of the pool
+                try:
+                    if pipeline is not None:
+                        pipeline.close()
+                finally:
+                    if ocrEngine is not self.model:
+                        ocrEngine.close()
             if artScanner.stopped:
                 self.log('扫描已中断')
             else:
@@ -646,6 +798,13 @@ class Worker(QObject):
         self.log(f'2: {self.star_dist_saved[1]} / {self.star_dist[1]}')
         self.log(f'1: {self.star_dist_saved[0]} / {self.star_dist[0]}')
 
+        if info['ExtraSettings']['PersistentOCRCache']:
+            self.model.cache.save('ocr_cache.json')
+        self.logger.info(f'OCR cache: {self.model.cache.hits} hits, {self.model.cache.misses} misses')
+
+        artScanner.close()
+        # waits until every screenshot is written
+        artifactDB.close()
         del artifactDB
         self.endScan.emit(export_name[info['exporter']])
         self.endWorking.emit()
@@ -658,6 +817,8 @@ class Worker(QObject):
 
 
 if __name__ == '__main__':
+    # the OCR worker processes start this executable again when frozen by PyInstaller
+    multiprocessing.freeze_support()
     try:
         app = QApplication(sys.argv)
         uiMain = UIMain()
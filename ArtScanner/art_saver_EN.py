@@ -1,17 +1,20 @@
+import itertools
 import json
-import os
-import sys
+import logging
+import math
 from enum import IntEnum as Enum
 
-import ZODB
-import persistent
-import transaction
-
 import ArtsInfo
-import utils
-from utils import logger
+import art_store
+import game_data
+import image_store
+
+# the root logger, utils adds the log file to it
+logger = logging.getLogger()
+
+# most combinations of snapped substats tried for an artifact
+SNAP_LIMIT = 256
 
-bundle_dir = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
 
 class ArtifactType(Enum):
     FLOWER = 0
@@ -52,56 +55,68 @@ class ArtifactStatType(Enum):
 
 
 class ArtifactStat:
-    def __init__(self, name, value, rarity=0, level=0, isMain=False):
+    '''
+    type: ArtifactStatType
+    raw: the value as shown in game as an integer, tenths of a percent for percentages, whole points otherwise
+    '''
+    __slots__ = ('type', 'raw')
+
+    def __init__(self, name, value):
         name = ArtsInfo.AttrName2Ids_EN[name]
-        value = utils.decodeValue(value)
+        value = game_data.decode_value(value)
         if type(value) == float and (name + '_PERCENT') in ArtsInfo.MainAttrNames_EN:
             name += '_PERCENT'
         self.type = getattr(ArtifactStatType, name)
-        # self.value = value
-        if isMain:
-            try:
-                self.value = ArtsInfo.MainAttrValue[rarity][name][level]
-            except KeyError:
-                self.value = value
-        else:
-            self.value = value
+        self.raw = game_data.display_value(name, value)
+
+    @classmethod
+    def fromRaw(cls, type, raw):
+        stat = cls.__new__(cls)
+        stat.type = ArtifactStatType(type)
+        stat.raw = raw
+        return stat
+
+    @property
+    def value(self):
+        '''
+        the shown value as a number, percentages as fractions
+        '''
+        return self.raw / 1000 if self.type.name in game_data.PERCENT_STATS else self.raw
 
     def __eq__(self, other):
         if type(other) == int or type(other) == float:
-            self_value_str = ArtsInfo.Formats[self.type.name].format(
-                self.value + 1e-5)
-            other_str = ArtsInfo.Formats[self.type.name].format(other + 1e-5)
-            return other_str == self_value_str
-        return str(self) == str(other)
+            return self.raw == game_data.display_value(self.type.name, other)
+        return isinstance(other, ArtifactStat) and self.type == other.type and self.raw == other.raw
 
     def compare_value(self, other):
-        self_value_str = ArtsInfo.Formats[self.type.name].format(
-            self.value + 1e-5)
-        other_str = ArtsInfo.Formats[self.type.name].format(other + 1e-5)
-        if self_value_str == other_str:
-            return 0
-        if utils.decodeValue(self_value_str) < utils.decodeValue(other_str):
-            return -1
-        return 1
+        other = game_data.display_value(self.type.name, other)
+        return (self.raw > other) - (self.raw < other)
 
     def __str__(self):
-        return ArtsInfo.MainAttrNames_EN[self.type.name] + "+" + ArtsInfo.Formats[self.type.name].format(
-            self.value + 1e-5)
-
-
-class Artifact(persistent.Persistent):
-    rare_substat_ranges = {getattr(ArtifactStatType, k): {j // 100: [i['PropValue'] for i in json.load(open(
-        f'{bundle_dir}/Tools/ReliquaryAffixExcelConfigData.json')) if i['DepotId'] == j and i['PropType'] == k] for j in
-                                                          [101, 201, 301, 401, 501]} for k in
-                           ArtsInfo.SubAttrNames_EN.keys()}
-    level_stat_range = {getattr(ArtifactStatType, k): {
-        l: {r: sum([[j['Value'] for j in i['AddProps'] if j['PropType'] == k] for i in json.load(
-            open(f'{bundle_dir}/Tools/ReliquaryLevelExcelConfigData.json')) if
-                    i.get('Level', -1) == l + 1 and i.get('Rank', -1) == r], []) for r in range(1, 6)} for l in
-        range(21)} for k in ArtsInfo.MainAttrNames_EN.keys()}
-
-    def __init__(self, info, image):
+        return ArtsInfo.MainAttrNames_EN[self.type.name] + "+" + ArtsInfo.Formats[self.type.name].format(self.value)
+
+
+def infer_level(info):
+    '''
+    returns the level of info, corrected by the main stat when the level crop is misread (see game_data.infer_level),
+    None if it can be neither read nor inferred
+    '''
+    try:
+        level = game_data.decode_value(info['level'])
+    except ValueError:
+        level = None
+    try:
+        stat = ArtifactStat(info['main_attr_name'], info['main_attr_value'])
+    except (KeyError, ValueError):
+        return level
+    inferred = game_data.infer_level(stat.type.name, info['star'], stat.raw, level)
+    if inferred != level:
+        logger.warning(f"Inferred level {inferred} from the main stat {stat}, read [{info['level']}]")
+    return inferred
+
+
+class Artifact:
+    def __init__(self, info, image=None):
         '''
             info: dict with keys:
                 'name': str, name of artifact
@@ -111,7 +126,7 @@ class Artifact(persistent.Persistent):
                 'main_attr_name': str, name of main stat
                 'main_attr_value': str/int/float, main stat value, example: '38.5%', '4,760', 144
                 'subattr_{i}': str, substat description, i could be 1-4, example: '暴击率+3.5%', '攻击力+130'
-            image: PIL.Image, screenshot of the artifact, will be shrinked to 300x512 to save space
+            image: reference of the screenshot of the artifact in an image_store.ImageStore, None if not kept
         '''
 
         self.name = info['name']
@@ -119,23 +134,57 @@ class Artifact(persistent.Persistent):
         typeid = ArtsInfo.TypeNames_EN.index(info['type'])
         self.setid = info['setid']
         self.type = ArtifactType(typeid)
-        self.level = utils.decodeValue(info['level'])
         self.rarity = info['star']
-        self.stat = ArtifactStat(
-            info['main_attr_name'],
-            info['main_attr_value'],
-            rarity=self.rarity, level=self.level, isMain=True)
+        self.level = infer_level(info)
+        if self.level is None:
+            raise ValueError(f"bad level {info['level']}")
+        self.stat = ArtifactStat(info['main_attr_name'], info['main_attr_value'])
+        # the main stat of a level is fixed, a misread value is snapped to it
+        raw = game_data.main_stat_raw(self.stat.type.name, self.rarity, self.level)
+        if raw is not None:
+            self.stat.raw = raw
         self.substats = [ArtifactStat(*info[tag].split('+'))
                          for tag in sorted(info.keys()) if "subattr_" in tag]
-        if image is not None:
-            self.image = image.resize((300, 512))
+        self.snap_substats()
+        self.image = image
         assert self.is_valid(), "Artifact attributes are not valid"
 
+    @classmethod
+    def fromRow(cls, row):
+        '''
+        row: fields of art_store.RECORD, as written by toRow
+        '''
+        art = cls.__new__(cls)
+        art.setid = row['setid']
+        art.name = ArtsInfo.ArtNames_EN[art.setid][row['name']]
+        art.type = ArtifactType(row['slot'])
+        art.level = row['level']
+        art.rarity = row['rarity']
+        art.stat = ArtifactStat.fromRaw(row['main'], row['main_raw'])
+        art.substats = [ArtifactStat.fromRaw(type, raw) for type, raw in zip(row['sub'], row['sub_raw'])
+                        if type != art_store.NO_SUBSTAT]
+        art.image = None
+        return art
+
+    def toRow(self):
+        padding = 4 - len(self.substats)
+        return {
+            'setid': self.setid,
+            'name': ArtsInfo.ArtNames_EN[self.setid].index(self.name),
+            'slot': self.type,
+            'level': self.level,
+            'rarity': self.rarity,
+            'main': self.stat.type,
+            'main_raw': self.stat.raw,
+            'sub': [i.type for i in self.substats] + [art_store.NO_SUBSTAT] * padding,
+            'sub_raw': [i.raw for i in self.substats] + [0] * padding,
+        }
+
     def is_valid(self):
         if self.level > ArtsInfo.RarityToMaxLvs[self.rarity - 1]:
             logger.error(f"Save Artifact failed: bad level")
             return False
-        if self.stat not in self.__class__.level_stat_range[self.stat.type][self.level][self.rarity]:
+        if self.stat.raw != game_data.main_stat_raw(self.stat.type.name, self.rarity, self.level):
             logger.error(f"Save Artifact failed: bad main stat value")
             return False
         if not self.calculate_substat_upgrades():
@@ -143,17 +192,29 @@ class Artifact(persistent.Persistent):
             return False
         return True
 
-    def calculate_substat_upgrades(self):
-        def all_possible_combinations(l, n_comb):
-            if n_comb == 0:
-                return [0]
-            t = all_possible_combinations(l, n_comb - 1)
-            result = []
-            for i in l:
-                for j in t:
-                    result.append(i + j)
-            return result
+    def snap_substats(self):
+        '''
+        replaces substats no roll can show by the legal values a digit edit away (see game_data.snap_substat),
+        when exactly one choice of them leaves the substats valid, otherwise keeps them as read
+        '''
+        max_rolls = self.level // 4 + 1
+        candidates = [game_data.snap_substat(i.type.name, self.rarity, i.raw, max_rolls) for i in self.substats]
+        read = [i.raw for i in self.substats]
+        if candidates == [[i] for i in read] or not all(candidates) or \
+                math.prod(len(i) for i in candidates) > SNAP_LIMIT:
+            return
+        valid = []
+        for values in itertools.product(*candidates):
+            for substat, value in zip(self.substats, values):
+                substat.raw = value
+            if self.calculate_substat_upgrades():
+                valid.append(values)
+        for substat, value, raw in zip(self.substats, valid[0] if len(valid) == 1 else read, read):
+            substat.raw = value
+            if value != raw:
+                logger.warning(f"Snapped substat {substat}, read as {raw}")
 
+    def calculate_substat_upgrades(self):
         def all_possible_combinations_nested(l, target_values=None):
             if len(l) == 0:
                 return [tuple()]
@@ -168,16 +229,9 @@ class Artifact(persistent.Persistent):
         n_upgrades = self.level // 4
         substat_upgrade_possibilities = []
         for i in self.substats:
-            substat_range = sorted(
-                self.__class__.rare_substat_ranges[i.type][self.rarity])
-            substat_upgrade_possibilities.append([])
-            for j in range(1, n_upgrades + 2):
-                if i.compare_value(substat_range[-1] * j) > 0:
-                    continue
-                if i.compare_value(substat_range[0] * j) < 0:
-                    break
-                if i in [k for k in all_possible_combinations(substat_range, j)]:
-                    substat_upgrade_possibilities[-1].append(j)
+            # numbers of rolls that can show the value, from the precomputed roll tables
+            substat_upgrade_possibilities.append(
+                game_data.substat_roll_counts(i.type.name, self.rarity, i.raw, n_upgrades + 1))
             if len(substat_upgrade_possibilities[-1]) == 0:
                 return []
         return all_possible_combinations_nested(substat_upgrade_possibilities, target_values=set(
@@ -185,25 +239,75 @@ class Artifact(persistent.Persistent):
 
 
 class ArtDatabase:
-    def __init__(self, path='artifacts.dat'):
-        self.db = ZODB.DB(None)
-        self.conn = self.db.open()
-        self.root = self.conn.root()
-        self.root['size'] = 0
+    '''
+    artifacts kept as columns of an art_store.ArtStore
+    path: optional backing file the artifacts are appended to, see art_store.ArtStore
+    image_dir: if given, screenshots shrinked to image_size are spilled to an image_store.ImageStore in this directory
+               and artifacts only keep their reference; none are kept otherwise
+    keep_images: screenshots to keep, 'all', 'failures' (of the artifacts failing to save) or 'none'
+    image_size: None keeps the screenshots as captured
+    '''
+
+    def __init__(self, path=None, group_size=32, image_dir=None, keep_images='failures', image_size=(300, 512)):
+        assert keep_images in ('all', 'failures', 'none'), f"bad keep_images {keep_images}"
+        self.store = art_store.ArtStore(path, group_size)
+        self.image_store = image_store.ImageStore(image_dir) if image_dir is not None else None
+        self.keep_images = keep_images
+        self.image_size = image_size
+        # image reference of each artifact, and info and image reference of each artifact failing to save
+        self.images = []
+        self.failures = []
 
     def __del__(self):
-        self.db.close()
+        self.close()
+
+    def __len__(self):
+        return len(self.store)
+
+    def close(self):
+        # __del__ also runs when __init__ failed halfway
+        if getattr(self, 'store', None) is not None:
+            self.store.close()
+        if getattr(self, 'image_store', None) is not None:
+            try:
+                self.image_store.close()
+            except Exception as e:
+                logger.error(f"Failed to write a screenshot: {e!r}")
 
     def add(self, info, art_img, raise_error=False):
         try:
-            self.root[str(self.root['size'])] = Artifact(info, art_img)
-            self.root['size'] += 1
-            transaction.commit()
-            return True
+            art = Artifact(info)
+            self.store.append(art.toRow())
         except Exception as e:
+            self.failures.append((info, self.spill(art_img, failed=True)))
             if raise_error:
                 raise
             return False
+        self.images.append(self.spill(art_img, failed=False))
+        return True
+
+    def spill(self, art_img, failed):
+        '''
+        returns the reference of art_img in the image store if keep_images keeps it, else None
+        '''
+        if (self.image_store is None or art_img is None or
+                self.keep_images != 'all' and not (failed and self.keep_images == 'failures')):
+            return None
+        image = art_img if self.image_size is None else art_img.resize(self.image_size)
+        try:
+            return self.image_store.put(image)
+        except Exception as e:
+            # an earlier screenshot could not be written, the store reports it once and goes on
+            logger.error(f"Failed to write a screenshot: {e!r}")
+            return self.image_store.put(image)
+
+    def loadImage(self, ref):
+        return self.image_store.get(ref)
+
+    def get(self, art_id):
+        art = Artifact.fromRow(self.store.row(art_id))
+        art.image = self.images[art_id]
+        return art
 
     def exportGOODJSON(self, path):
         result = {
@@ -214,8 +318,8 @@ class ArtDatabase:
             "artifacts": [],
             # "weapons": []
         }
-        for art_id in range(self.root['size']):
-            art: Artifact = self.root[str(art_id)]
+        for art_id in range(len(self.store)):
+            art = self.get(art_id)
             result['artifacts'].append(
                 {
                     "setKey":      ArtsInfo.SetNamesGOOD[art.setid],
@@ -228,9 +332,9 @@ class ArtDatabase:
                     "substats": [
                         {
                             "key":   ArtsInfo.AttrNamesGOOD[substat.type.name],
-                            "value": substat.value * 100
+                            "value": substat.raw / 10
                             if ArtsInfo.AttrNamesGOOD[substat.type.name].endswith("_")
-                            else substat.value,
+                            else substat.raw,
                         }
                         for substat in art.substats
                     ]
@@ -245,8 +349,8 @@ class ArtDatabase:
     def exportGenshinArtJSON(self, path):
         result = {"version": "1", "flower": [],
                   "feather": [], "sand": [], "cup": [], "head": []}
-        for art_id in range(self.root['size']):
-            art = self.root[str(art_id)]
+        for art_id in range(len(self.store)):
+            art = self.get(art_id)
             result[ArtsInfo.TypeNamesGenshinArt[art.type]].append(
                 {
                     "setName": ArtsInfo.SetNamesGenshinArt[art.setid],
@@ -276,8 +380,8 @@ class ArtDatabase:
 
     def exportGenmoCalcJSON(self, path):
         result = []
-        for art_id in range(self.root['size']):
-            art = self.root[str(art_id)]
+        for art_id in range(len(self.store)):
+            art = self.get(art_id)
             result.append({
                 "asKey": ArtsInfo.SetNamesMingyuLab[art.setid],
                 "rarity": art.rarity,
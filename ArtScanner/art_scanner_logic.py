@@ -5,7 +5,7 @@ import mouse
 import numpy as np
 import win32gui
 
-from utils import captureWindow
+from capture import CaptureSession, MSSBackend, ProbeSet
 
 
 class GameInfo:
@@ -54,27 +54,43 @@ class GameInfo:
 
 
 class ArtScannerLogic:
-    def __init__(self, game_info):
+    def __init__(self, game_info, capture=None):
         self.game_info = game_info
+        self.capture = capture if capture is not None else CaptureSession(MSSBackend(game_info.hwnd))
         self.stopped = False
         self.avg_response_time = 1 / 60
+        # slowest time a scroll step took to show, None before the first one
+        self.max_scroll_time = None
+        # margin near level number of the first row, color=233,229,220 when a row is aligned
+        self.scroll_probes = ProbeSet(self.capture).addPixel(
+            'scroll_fin', self.game_info.scroll_fin_keypt_x, self.game_info.scroll_fin_keypt_y,
+            color=(233, 229, 220), tol=5).addRegion('first_art', (
+                self.game_info.first_art_x + self.game_info.art_width / 2 - 1,
+                self.game_info.first_art_y + self.game_info.art_height / 2,
+                self.game_info.first_art_x + self.game_info.art_width / 2 + 1,
+                self.game_info.first_art_y + self.game_info.art_height))
+        self.switch_probes = {}
 
     def interrupt(self):
         self.stopped = True
 
+    def close(self):
+        self.capture.close()
+
     def waitSwitched(self, art_center_x, art_center_y, min_wait=0.1, max_wait=3,
                      condition=lambda pix: sum(pix) / 3 > 200):
         start = time.time()
         total_wait = 0
+        key = (int(round(art_center_x)), int(round(art_center_y)))
+        if key not in self.switch_probes:
+            self.switch_probes[key] = ProbeSet(self.capture).addPixel(
+                'frame', art_center_x - self.game_info.art_width / 2 - self.game_info.art_expand, art_center_y)
+        probes = self.switch_probes[key]
         while True:
             mouse.move(self.game_info.left + art_center_x, self.game_info.top + art_center_y)
             mouse.click()
-            pix = captureWindow(self.game_info.hwnd, (
-                art_center_x - self.game_info.art_width / 2 - self.game_info.art_expand,
-                art_center_y,
-                art_center_x - self.game_info.art_width / 2 - self.game_info.art_expand + 1.5,
-                art_center_y + 1.5))
-            if condition(pix.getpixel((0, 0))):
+            pix = probes.tick().pixel('frame')
+            if condition(pix.tolist()):
                 self.avg_response_time = 0.5 * self.avg_response_time + 0.5 * (time.time() - start)
                 return True
             else:
@@ -90,10 +106,35 @@ class ArtScannerLogic:
                 self.game_info.art_height + self.game_info.art_gap_y) * row + self.game_info.art_height / 5
         return art_center_x, art_center_y
 
-    def scanRows(self, rows, callback):
+    def infoRect(self):
+        return (self.game_info.art_info_left,
+                self.game_info.art_info_top,
+                self.game_info.art_info_left + self.game_info.art_info_width,
+                self.game_info.art_info_top + self.game_info.art_info_height)
+
+    def captureArt(self, row, col, as_array=False):
+        '''
+        clicks the artifact at row, col of the rows shown and captures its info panel again,
+        None if it cannot be selected
+        '''
+        art_center_x, art_center_y = self.getArtCenter(row, col)
+        if not self.waitSwitched(art_center_x, art_center_y, min_wait=0.1, max_wait=3):
+            return None
+        time.sleep(0.05)
+        return (self.capture.grabArray if as_array else self.capture.grab)(self.infoRect())
+
+    def scanRows(self, rows, callback, as_array=False, recapture=0):
         '''
         callback: function to take in artifact image and do what ever you want
+        as_array: pass the image as an RGB array viewing the capture buffer instead of a PIL image,
+                  the array is only valid until callback returns
+        recapture: if above 0, callback(art_img, retries_left) is called instead, still once the next artifact is
+                   clicked so recognition overlaps the game switching panels; it returns False to have the artifact
+                   clicked again and captured again (at most recapture times), and has to take the capture
+                   when retries_left is 0
         '''
+        grab = self.capture.grabArray if as_array else self.capture.grab
+        info_rect = self.infoRect()
         rows = list(rows)
         if len(rows) < 1:
             return True
@@ -105,11 +146,8 @@ class ArtScannerLogic:
                 if self.stopped:
                     return False
                 if self.waitSwitched(art_center_x, art_center_y, min_wait=0.1, max_wait=3):
-                    art_img = captureWindow(self.game_info.hwnd, (
-                        self.game_info.art_info_left,
-                        self.game_info.art_info_top,
-                        self.game_info.art_info_left + self.game_info.art_info_width,
-                        self.game_info.art_info_top + self.game_info.art_info_height))
+                    art_img = grab(info_rect)
+                    current = art_center_x, art_center_y
                     if art_col == self.game_info.art_cols - 1:
                         art_row += 1
                         art_col = 0
@@ -119,7 +157,20 @@ class ArtScannerLogic:
                         art_center_x, art_center_y = self.getArtCenter(art_row, art_col)
                         mouse.move(self.game_info.left + art_center_x, self.game_info.top + art_center_y)
                         mouse.click()
-                    callback(art_img)
+                    if not recapture:
+                        callback(art_img)
+                        continue
+                    retries = recapture
+                    while callback(art_img, retries) is False and retries > 0:
+                        # e.g. a low confidence read of a panel that was still being drawn, go back to the artifact
+                        retries -= 1
+                        if not self.waitSwitched(*current, min_wait=0.1, max_wait=3):
+                            return False
+                        time.sleep(0.05)
+                        art_img = grab(info_rect)
+                    if retries != recapture and art_row in rows:
+                        mouse.move(self.game_info.left + art_center_x, self.game_info.top + art_center_y)
+                        mouse.click()
                 else:
                     return False
         return True
@@ -127,13 +178,7 @@ class ArtScannerLogic:
     def alignFirstRow(self):
         mouse.move(self.game_info.left + self.game_info.first_art_x, self.game_info.top + self.game_info.first_art_y)
         mouse.click()
-        pix = captureWindow(self.game_info.hwnd, (
-            self.game_info.scroll_fin_keypt_x,
-            self.game_info.scroll_fin_keypt_y,
-            self.game_info.scroll_fin_keypt_x + 1.5,
-            self.game_info.scroll_fin_keypt_y + 1.5))
-        if abs(pix.getpixel((0, 0))[0] - 233) > 5 or abs(pix.getpixel((0, 0))[1] - 229) > 5 or abs(
-                pix.getpixel((0, 0))[2] - 220) > 5:
+        if not self.scroll_probes.tick().match('scroll_fin'):
             for _ in range(3):
                 mouse.wheel(1)
             time.sleep(0.1)
@@ -143,14 +188,11 @@ class ArtScannerLogic:
         in_between_row = False
         rows_scrolled = 0
         lines_scrolled = 0
+        # every tick grabs the key pixel and the first artifact strip together,
+        # the frame which ended the previous wait is reused for the next step
+        frame = self.scroll_probes.tick()
         while True:
-            pix = captureWindow(self.game_info.hwnd, (
-                self.game_info.scroll_fin_keypt_x,
-                self.game_info.scroll_fin_keypt_y,
-                self.game_info.scroll_fin_keypt_x + 1.5,
-                self.game_info.scroll_fin_keypt_y + 1.5))
-            if abs(pix.getpixel((0, 0))[0] - 233) > 5 or abs(pix.getpixel((0, 0))[1] - 229) > 5 or abs(
-                    pix.getpixel((0, 0))[2] - 220) > 5:
+            if not frame.match('scroll_fin'):
                 # if in_between_row==False:
                 #     print('到行之间了')
                 in_between_row = True
@@ -165,22 +207,24 @@ class ArtScannerLogic:
                     return rows_scrolled
             if lines_scrolled > max_scrolls:
                 return rows_scrolled
-            get_first_art = lambda: np.array(captureWindow(self.game_info.hwnd, (
-                self.game_info.first_art_x + self.game_info.art_width / 2 - 1,
-                self.game_info.first_art_y + self.game_info.art_height / 2,
-                self.game_info.first_art_x + self.game_info.art_width / 2 + 1,
-                self.game_info.first_art_y + self.game_info.art_height)))
-            first_art = get_first_art()
+            # copy out of the reused capture buffer, int16 so the difference below does not wrap around
+            first_art = frame.region('first_art').astype(np.int16)
             for _ in range(7 if lines_scrolled == 0 and target_row > 0 else 1):
                 mouse.wheel(-1)
                 lines_scrolled += 1
                 # print('翻一下')
+            start = time.time()
             time.sleep(self.avg_response_time)
+            # the list does not move past its end, a step not showing in a few times the slowest step so far
+            # (5s before the first one) means the end is reached
+            timeout = 5 if self.max_scroll_time is None else min(5, max(1, 4 * self.max_scroll_time))
             total_waited = 0
             while True:
-                if total_waited > 5:
-                    break
-                if np.max(np.abs(get_first_art() - first_art)) > 5:
+                frame = self.scroll_probes.tick()
+                if frame.changed('first_art', first_art, tol=5):
+                    self.max_scroll_time = max(self.max_scroll_time or 0, time.time() - start)
                     break
+                if total_waited > timeout:
+                    return rows_scrolled
                 time.sleep(interval)
                 total_waited += interval
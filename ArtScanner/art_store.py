@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+
+# one row per artifact; in memory every field is a column of its own, on disk rows are appended as records
+RECORD = np.dtype([
+    ('setid', 'u1'),
+    ('name', 'u1'),  # index of the name in the set
+    ('slot', 'u1'),
+    ('level', 'u1'),
+    ('rarity', 'u1'),
+    ('main', 'u1'),  # ArtifactStatType
+    ('main_raw', 'u2'),  # value as shown in game as an integer, see game_data.display_value
+    ('sub', 'u1', (4,)),  # ArtifactStatType, NO_SUBSTAT for missing substats
+    ('sub_raw', 'u2', (4,)),
+])
+NO_SUBSTAT = 255
+MAGIC = b'AMENOMA-ARTS-1\n\0'
+
+
+class ArtStore:
+    '''
+    Append-only columnar store of artifacts: a numpy array per field of RECORD, grown by doubling,
+    so an artifact costs RECORD.itemsize (20) bytes and adding one no allocation in most cases.
+    path: if given, rows are also appended to this file, which is truncated first. They are written and synced
+          in groups of group_size rows (group commit) and on commit() / close(), so a crash loses at most
+          the last group. load(path) reads such a file back.
+    Safe to share between threads.
+    '''
+
+    def __init__(self, path=None, group_size=32, capacity=256):
+        self.columns = {name: np.zeros((capacity,) + RECORD[name].shape, RECORD[name].base)
+                        for name in RECORD.names}
+        self.size = 0
+        self.committed = 0
+        self.group_size = group_size
+        self.lock = threading.Lock()
+        self.file = None
+        if path is not None:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        the store of the rows in the file at path, without a backing file; a partially written last row is dropped
+        '''
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f'{path} is not an artifact store')
+        rows = np.frombuffer(data, RECORD, (len(data) - len(MAGIC)) // RECORD.itemsize, len(MAGIC))
+        store = cls(capacity=max(len(rows), 1))
+        for name in RECORD.names:
+            store.columns[name][:len(rows)] = rows[name]
+        store.size = store.committed = len(rows)
+        return store
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        '''
+        row: dict with the fields of RECORD
+        returns the index of the row
+        '''
+        with self.lock:
+            if self.size == len(self.columns['setid']):
+                for name, column in self.columns.items():
+                    self.columns[name] = np.concatenate([column, np.zeros_like(column)])
+            for name, column in self.columns.items():
+                column[self.size] = row[name]
+            self.size += 1
+            if self.size - self.committed >= self.group_size:
+                self._commit()
+            return self.size - 1
+
+    def row(self, index):
+        '''
+        the fields of row index as python values
+        '''
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return {name: column[index].tolist() for name, column in self.columns.items()}
+
+    def commit(self):
+        with self.lock:
+            self._commit()
+
+    def _commit(self):
+        if self.file is not None and self.committed < self.size:
+            rows = np.empty(self.size - self.committed, RECORD)
+            for name, column in self.columns.items():
+                rows[name] = column[self.committed:self.size]
+            self.file.write(rows.tobytes())
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.committed = self.size
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,53 @@
+'''
+Import-time benchmark of art_saver: the stat tables art_saver used to build from the Excel configs when imported,
+against importing it now and loading game_data's tables on first use, from the compiled cache and without it.
+Every case runs in a fresh interpreter.
+
+    python bench_art_saver.py --runs 5
+'''
+import argparse
+import os
+import subprocess
+import sys
+
+# the class attributes of Artifact before game_data, the level config is parsed again for every stat, level and rank
+OLD_TABLES = '''
+import json
+import ArtsInfo
+bundle_dir = '.'
+rare_substat_ranges = {k: {j // 100: [i['PropValue'] for i in json.load(open(
+    f'{bundle_dir}/Tools/ReliquaryAffixExcelConfigData.json')) if i['DepotId'] == j and i['PropType'] == k] for j in
+                          [101, 201, 301, 401, 501]} for k in ArtsInfo.SubAttrNames.keys()}
+level_stat_range = {k: {
+    l: {r: sum([[j['Value'] for j in i['AddProps'] if j['PropType'] == k] for i in json.load(
+        open(f'{bundle_dir}/Tools/ReliquaryLevelExcelConfigData.json')) if
+                i.get('Level', -1) == l + 1 and i.get('Rank', -1) == r], []) for r in range(1, 6)} for l in
+    range(21)} for k in ArtsInfo.MainAttrNames.keys()}
+'''
+
+CASES = [
+    ('old import-time tables', 'import ArtsInfo', OLD_TABLES),
+    ('import art_saver', 'import ArtsInfo, persistent, ZODB, utils', 'import art_saver'),
+    ('tables, compiled cache', 'import game_data', 'game_data.tables()'),
+    ('tables, no cache', 'import game_data; game_data.CACHE = "missing/game_data.json"', 'game_data.tables()'),
+]
+
+
+def run(setup, statement):
+    '''
+    returns the seconds statement takes in a fresh interpreter after setup
+    '''
+    code = f'{setup}\nimport time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return float(output.split()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the import time of art_saver')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, setup, statement in CASES:
+        times = sorted(run(setup, statement) for _ in range(args.runs))
+        print(f'{name:<24} median {times[len(times) // 2] * 1000:8.1f}ms, best {times[0] * 1000:8.1f}ms')
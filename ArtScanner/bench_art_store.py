@@ -0,0 +1,110 @@
+'''
+Benchmark of saving scanned artifacts: the ZODB database committing a transaction per artifact (the old
+ArtDatabase) against ArtDatabase on the columnar store, in memory and with a backing file.
+Time per add and memory held once every artifact is added, without images.
+
+    python bench_art_store.py --artifacts 2000
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import ZODB
+import persistent
+import transaction
+
+import ArtsInfo
+import game_data
+from art_saver import Artifact, ArtDatabase
+
+
+class PersistentArtifact(Artifact, persistent.Persistent):
+    pass
+
+
+class ZODBDatabase:
+    '''
+    the old ArtDatabase
+    '''
+
+    def __init__(self):
+        self.db = ZODB.DB(None)
+        self.conn = self.db.open()
+        self.root = self.conn.root()
+        self.root['size'] = 0
+
+    def close(self):
+        self.db.close()
+
+    def add(self, info, art_img):
+        self.root[str(self.root['size'])] = PersistentArtifact(info, art_img)
+        self.root['size'] += 1
+        transaction.commit()
+        return True
+
+
+def inventory(n, seed=0):
+    '''
+    n valid artifacts as read by OCR
+    '''
+    rng = random.Random(seed)
+    tiers = game_data.parse_substat_tiers()
+    main_stats = game_data.parse_main_stats()
+    result = []
+    for _ in range(n):
+        rarity = rng.choice([4, 5, 5, 5])
+        level = rng.randint(0, ArtsInfo.RarityToMaxLvs[rarity - 1])
+        setid = rng.randrange(len(ArtsInfo.ArtNames))
+        slot = rng.randrange(len(ArtsInfo.ArtNames[setid])) if len(ArtsInfo.ArtNames[setid]) > 1 else 4
+        main = rng.choice(ArtsInfo.TypeMainAttrs[slot])
+        base = rng.choice(ArtsInfo.RarityToBaseStatNumber[rarity])
+        stats = rng.sample([i for i in ArtsInfo.SubAttrNames if i != main], min(4, base + level // 4))
+        rolls = [1] * len(stats)
+        for _ in range(base + level // 4 - len(stats)):
+            rolls[rng.randrange(len(stats))] += 1
+        info = {
+            'name': ArtsInfo.ArtNames[setid][slot if slot < len(ArtsInfo.ArtNames[setid]) else 0],
+            'setid': setid,
+            'type': ArtsInfo.TypeNames[slot],
+            'star': rarity,
+            'level': f'+{level}',
+            'main_attr_name': ArtsInfo.MainAttrNames[main],
+            'main_attr_value': ArtsInfo.Formats[main].format(main_stats[main][rarity][level] + 1e-5),
+        }
+        for i, (stat, n_rolls) in enumerate(zip(stats, rolls)):
+            value = sum(rng.choice(tiers[stat][rarity]) for _ in range(n_rolls))
+            info[f'subattr_{i + 1}'] = ArtsInfo.SubAttrNames[stat] + '+' + ArtsInfo.Formats[stat].format(value + 1e-5)
+        result.append(info)
+    return result
+
+
+def bench(name, create, infos):
+    tracemalloc.start()
+    db = create()
+    start = time.perf_counter()
+    saved = sum(db.add(info, None) for info in infos)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    db.close()
+    print(f'{name:<24} {elapsed / len(infos) * 1e6:8.1f}us per add, {memory / 1024:8.1f}KB held, '
+          f'{saved} of {len(infos)} saved')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark saving artifacts')
+    parser.add_argument('--artifacts', type=int, default=2000)
+    args = parser.parse_args()
+
+    infos = inventory(args.artifacts)
+    game_data.tables()
+    with tempfile.TemporaryDirectory() as directory:
+        for name, create in [
+            ('ZODB, commit per add', ZODBDatabase),
+            ('columnar, in memory', ArtDatabase),
+            ('columnar, backing file', lambda: ArtDatabase(os.path.join(directory, 'artifacts.dat'))),
+        ]:
+            bench(name, create, infos)
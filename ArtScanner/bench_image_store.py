@@ -0,0 +1,109 @@
+'''
+Benchmark of the screenshots a scan keeps: every artifact holding its 300x512 screenshot in memory (the old Artifact)
+against ArtDatabase spilling them to an image store, keeping all of them, those of the failures, or none.
+Every case scans the same synthetic info panels in a fresh interpreter and reports its peak RSS.
+
+    python bench_image_store.py --artifacts 2000 --failures 0.05
+'''
+import argparse
+import ctypes
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from bench_art_store import inventory
+
+CASES = ['in memory', 'spill all', 'spill failures', 'none']
+
+
+def peak_rss():
+    '''
+    peak resident set size of this process in bytes
+    '''
+    if sys.platform == 'win32':
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong)] + [
+                (name, ctypes.c_size_t) for name in
+                ['PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage']]
+
+        counters = Counters(cb=ctypes.sizeof(Counters))
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                                 counters.cb)
+        return counters.PeakWorkingSetSize
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def panel(info, seed):
+    '''
+    a 480x720 stand-in of an info panel: flat colors, some blocks and the text of info
+    '''
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((720, 480, 3), np.uint8)
+    pixels[:] = (236, 229, 216)
+    pixels[:160] = rng.integers(60, 200, 3)
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    for i, (key, value) in enumerate(info.items()):
+        draw.text((20, 20 + 36 * i), f'{key} {value}', fill=(73, 83, 102))
+    for _ in range(8):
+        x, y = rng.integers(0, 440), rng.integers(160, 680)
+        draw.rectangle((x, y, x + 40, y + 40), fill=tuple(int(i) for i in rng.integers(0, 255, 3)))
+    return image
+
+
+def scan(case, n, failures, directory):
+    import art_saver
+    infos = inventory(n)
+    rng = np.random.default_rng(0)
+    if case == 'in memory':
+        kept = []
+    else:
+        db = art_saver.ArtDatabase(image_dir=None if case == 'none' else directory,
+                                   keep_images={'spill all': 'all', 'spill failures': 'failures'}.get(case, 'none'))
+    start = time.perf_counter()
+    for i, info in enumerate(infos):
+        image = panel(info, i)
+        if rng.random() < failures:
+            info = {**info, 'main_attr_name': '?'}
+        if case == 'in memory':
+            try:
+                kept.append(art_saver.Artifact(info))
+                kept[-1].image = image.resize((300, 512))
+            except Exception:
+                pass
+        else:
+            db.add(info, image)
+    if case != 'in memory':
+        db.close()
+    elapsed = time.perf_counter() - start
+    size = sum(entry.stat().st_size for entry in os.scandir(directory))
+    return {'per_artifact': elapsed / n, 'peak_rss': peak_rss(), 'disk': size}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark keeping the screenshots of a scan')
+    parser.add_argument('--artifacts', type=int, default=2000)
+    parser.add_argument('--failures', type=float, default=0.05, help='ratio of artifacts failing to save')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(scan(args.case, args.artifacts, args.failures, args.directory)))
+        sys.exit()
+    for case in CASES:
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.run([sys.executable, __file__, '--case', case, '--directory', directory,
+                                     '--artifacts', str(args.artifacts), '--failures', str(args.failures)],
+                                    capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.split('\n')[-2])
+        print(f'{case:<16} {result["per_artifact"] * 1000:6.2f}ms per artifact, '
+              f'peak RSS {result["peak_rss"] / 2 ** 20:7.1f}MB, on disk {result["disk"] / 2 ** 20:6.1f}MB')
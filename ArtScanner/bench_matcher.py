@@ -0,0 +1,135 @@
+'''
+Micro-benchmark of the auto-correction of artifact and main stat names: the linear Levenshtein scan over every
+known name (the old utils functions) against the matcher, on exact reads and on simulated misreads,
+and names and main stats corrected one by one against name, type and main stat corrected together.
+
+    python bench_matcher.py --reads 20000 --misread 0.2
+'''
+import argparse
+import random
+import time
+
+import Levenshtein
+
+import ArtsInfo
+import matcher
+
+
+def linear(text, words):
+    '''
+    the old correction: the first word with the smallest distance
+    '''
+    corr_name = ''
+    dis = 10000000
+    for word in words:
+        ndis = Levenshtein.distance(text, word)
+        if ndis < dis:
+            dis = ndis
+            corr_name = word
+    return corr_name
+
+
+def misread(word, rng):
+    '''
+    drops, replaces or duplicates one or two characters, using characters of the other words
+    '''
+    chars = list(word)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.randrange(3)
+        if op == 0 and len(chars) > 2:
+            del chars[i]
+        elif op == 1:
+            chars[i] = rng.choice(word + '的之羽花')
+        else:
+            chars.insert(i, chars[i])
+    return ''.join(chars)
+
+
+def reads(words, n, misread_ratio, distinct=200, seed=0):
+    '''
+    n reads of random words, misread_ratio of them misread from a pool of distinct misreads,
+    as the same line renders the same way and is misread the same way again
+    '''
+    rng = random.Random(seed)
+    misreads = [misread(rng.choice(words), rng) for _ in range(distinct)]
+    return [rng.choice(misreads) if rng.random() < misread_ratio else rng.choice(words) for _ in range(n)]
+
+
+def artifacts(art_names, type_names, main_attr_names, n, misread_ratio, seed=0):
+    '''
+    n artifacts as (name, type, main stat) read and as they are, each field misread with misread_ratio
+    '''
+    rng = random.Random(seed)
+    result = []
+    for _ in range(n):
+        arts = rng.choice(art_names)
+        slot = rng.randrange(len(arts)) if len(arts) == len(type_names) else len(type_names) - 1
+        truth = (arts[slot if len(arts) == len(type_names) else 0], type_names[slot],
+                 main_attr_names[rng.choice(ArtsInfo.TypeMainAttrs[slot])])
+        read = tuple(misread(i, rng) if rng.random() < misread_ratio else i for i in truth)
+        result.append((read, truth))
+    return result
+
+
+def bench_resolve(name, art_names, type_names, main_attr_names, n, misread_ratio):
+    '''
+    names and main stats corrected one by one against the fields corrected together by the resolver
+    '''
+    name_matcher = matcher.artifact_matcher(art_names)
+    attr_matcher = matcher.Matcher(main_attr_names.values())
+    type_matcher = matcher.Matcher(type_names)
+    resolver = matcher.ArtifactResolver(art_names, type_names, main_attr_names)
+    cases = artifacts(art_names, type_names, main_attr_names, n, misread_ratio)
+
+    def separate(read):
+        return name_matcher.match(read[0])[0][0], type_matcher.match(read[1])[0], attr_matcher.match(read[2])[0]
+
+    def joint(read):
+        resolved = resolver.resolve(*read)[0]
+        return resolved['name'], resolved['type'], resolved['main_attr_name']
+
+    for method, correct in [('separate', separate), ('joint', joint)]:
+        start = time.perf_counter()
+        results = [correct(read) for read, _ in cases]
+        elapsed = time.perf_counter() - start
+        names = sum(result[0] == truth[0] for result, (_, truth) in zip(results, cases))
+        types = sum(result[1] == truth[1] for result, (_, truth) in zip(results, cases))
+        attrs = sum(result[2] == truth[2] for result, (_, truth) in zip(results, cases))
+        print(f'{name}, {method:<8} {elapsed / n * 1e6:8.2f}us per artifact, names right {names / n:7.2%}, '
+              f'types right {types / n:7.2%}, main stats right {attrs / n:7.2%}')
+
+
+def bench(name, words, texts, match):
+    start = time.perf_counter()
+    for text in texts:
+        match(text)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<28} {elapsed / len(texts) * 1e6:8.2f}us per read')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark name auto-correction')
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--misread', type=float, default=0.2, help='ratio of misread names')
+    args = parser.parse_args()
+
+    cases = [
+        ('names', sum(ArtsInfo.ArtNames, []), matcher.name_matcher, lambda value: value[0]),
+        ('names EN', sum(ArtsInfo.ArtNames_EN, []), matcher.name_matcher_EN, lambda value: value[0]),
+        ('main stats', list(ArtsInfo.MainAttrNames.values()), matcher.attr_matcher, lambda value: value),
+        ('main stats EN', list(ArtsInfo.MainAttrNames_EN.values()), matcher.attr_matcher_EN, lambda value: value),
+    ]
+    for name, words, index, word_of in cases:
+        texts = reads(words, args.reads, args.misread)
+        disagreements = sum(linear(text, words) != word_of(index.match(text)[0]) for text in set(texts))
+        # a fresh matcher, the agreement check above filled the memo
+        index = type(index)(index.exact.keys(), index.exact.values())
+        bench(f'{name}, linear', words, texts, lambda text: linear(text, words))
+        bench(f'{name}, matcher', words, texts, index.match)
+        bench(f'{name}, BK-tree only', words, texts, lambda text: index.tree.nearest(text))
+        print(f'{name}: {disagreements} of {len(set(texts))} distinct reads corrected differently')
+    bench_resolve('artifacts', ArtsInfo.ArtNames, ArtsInfo.TypeNames, ArtsInfo.MainAttrNames,
+                  args.reads, args.misread)
+    bench_resolve('artifacts EN', ArtsInfo.ArtNames_EN, ArtsInfo.TypeNames_EN, ArtsInfo.MainAttrNames_EN,
+                  args.reads, args.misread)
@@ -0,0 +1,82 @@
+'''
+Micro-benchmark of OCR per artifact: field preprocessing one crop at a time against preprocess_panel,
+and inference with model.predict (the old path) against the compiled graph.
+The info panels are rendered by the headless game simulator, so no game window is needed.
+
+    python bench_ocr.py --weights weights-improvement-55-1.00.hdf5 --artifacts 200
+'''
+import argparse
+import time
+
+import numpy as np
+
+from simulator import GameSimulator
+
+
+def bench(name, model, panels, compiled, batch):
+    model.compiled = compiled
+    # the first call traces the graph or builds the predict function, keep it out of the timing
+    model.detect_info_batch(panels[:batch])
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(panels), batch):
+        t = time.perf_counter()
+        model.detect_info_batch(panels[i:i + batch])
+        latencies.append((time.perf_counter() - t) / len(panels[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f'{name:<24} {len(panels) / elapsed:8.1f} artifacts/s, per artifact: '
+          f'median {latencies[len(latencies) // 2] * 1000:6.2f}ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f}ms')
+
+
+def bench_preprocess(model, panels, extract):
+    '''
+    per-field crops preprocessed one by one with PIL (the old path) against preprocess_panel
+    '''
+    def old(art_img):
+        info = extract(art_img)
+        return [model.preprocess(info[key]).T for key in sorted(info.keys())]
+
+    def new(art_img):
+        keys = model.panel_fields(art_img)
+        out = np.empty((len(keys), model.width, model.height), np.float32)
+        model.preprocess_panel(art_img, keys, out)
+        return out
+
+    difference = max(np.abs(np.array(old(i)) - new(i)).max() for i in panels)
+    for name, preprocess in [('preprocess, per field', old), ('preprocess, panel', new)]:
+        start = time.perf_counter()
+        for art_img in panels:
+            preprocess(art_img)
+        print(f'{name:<24} {(time.perf_counter() - start) / len(panels) * 1000:6.2f}ms per artifact')
+    print(f'max difference {difference:.2g}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark OCR inference per artifact')
+    parser.add_argument('--weights', default='weights-improvement-55-1.00.hdf5',
+                        help='keras weights, or a model exported by Tools/export_model.py')
+    parser.add_argument('--artifacts', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=8, help='artifacts per batch of the batched runs')
+    parser.add_argument('--en', action='store_true', help='benchmark the English model')
+    args = parser.parse_args()
+
+    simulator = GameSimulator(1920, 1080, args.artifacts)
+    panels = [simulator.panel(i).copy() for i in range(args.artifacts)]
+    if args.en:
+        import ocr_EN as ocr
+    else:
+        import ocr
+    model = ocr.OCR(model_weight=args.weights, scale_ratio=simulator.game_info.scale_ratio)
+    model.warmup()
+
+    bench_preprocess(model, panels, model.extract_art_info_EN if args.en else model.extract_art_info)
+
+    # exported models (.onnx / .tflite) have no model.predict path
+    if model.model is not None:
+        bench('predict, 1 artifact', model, panels, False, 1)
+    bench('compiled, 1 artifact', model, panels, True, 1)
+    if model.model is not None:
+        bench(f'predict, {args.batch} artifacts', model, panels, False, args.batch)
+    bench(f'compiled, {args.batch} artifacts', model, panels, True, args.batch)
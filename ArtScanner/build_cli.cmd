@@ -1 +1,5 @@
-pyinstaller -F --clean  --add-data "weights-improvement-55-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n ArtScannerCLI main.py
\ No newline at end of file
+python game_data.py
+cd Tools
+python export_model.py ../weights-improvement-55-1.00.hdf5 --out ../ocr --skip onnx tflite int8 --test 0
+cd ..
+pyinstaller -F --clean  --add-data "weights-improvement-55-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --add-data "Tools/game_data.json;./Tools" --add-data "ocr_saved_model;./ocr_saved_model" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n ArtScannerCLI main.py
\ No newline at end of file
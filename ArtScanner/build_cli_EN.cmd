@@ -1 +1,2 @@
-::pyinstaller -F --clean  --add-data "weights-improvement-EN-81-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n ArtScannerCLI_EN main.py
\ No newline at end of file
+python game_data.py
+::pyinstaller -F --clean  --add-data "weights-improvement-EN-81-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --add-data "Tools/game_data.json;./Tools" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n ArtScannerCLI_EN main.py
\ No newline at end of file
@@ -1 +1,5 @@
-pyinstaller -w -D --clean --add-data "weights-improvement-55-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --add-data "rcc/genshin.ttf;./rcc" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n Amenoma UImain.py
\ No newline at end of file
+python game_data.py
+cd Tools
+python export_model.py ../weights-improvement-55-1.00.hdf5 --out ../ocr --skip onnx tflite int8 --test 0
+cd ..
+pyinstaller -w -D --clean --add-data "weights-improvement-55-1.00.hdf5;." --add-data "Tools/ReliquaryLevelExcelConfigData.json;./Tools" --add-data "Tools/ReliquaryAffixExcelConfigData.json;./Tools" --add-data "Tools/game_data.json;./Tools" --add-data "ocr_saved_model;./ocr_saved_model" --add-data "rcc/genshin.ttf;./rcc" --hidden-import=h5py --hidden-import=h5py.defs --hidden-import=h5py.utils --hidden-import=h5py.h5ac --hidden-import=h5py._proxy --uac-admin -n Amenoma UImain.py
\ No newline at end of file
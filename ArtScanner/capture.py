@@ -0,0 +1,239 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+
+class CaptureBackend:
+    '''
+    Interface of a frame grabber used by CaptureSession.
+    All coordinates are screen coordinates. grab() returns an array of shape (height, width, channels)
+    laid out as described by pixelFormat, it may be a view that is only valid until the next grab.
+    '''
+    pixelFormat = 'RGB'
+
+    def windowRect(self):
+        raise NotImplementedError
+
+    def clientOrigin(self):
+        raise NotImplementedError
+
+    def grab(self, left, top, width, height):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MSSBackend(CaptureBackend):
+    '''
+    Grabs frames of a window on the real screen with one long-lived mss instance.
+    The mss instance is bound to the thread creating the backend, so create it in the scanning thread.
+    '''
+    pixelFormat = 'BGRA'
+
+    def __init__(self, hwnd):
+        import win32gui
+        from mss import mss
+        self.hwnd = hwnd
+        self.win32gui = win32gui
+        self.sct = mss()
+
+    def windowRect(self):
+        return self.win32gui.GetWindowRect(self.hwnd)
+
+    def clientOrigin(self):
+        return self.win32gui.ClientToScreen(self.hwnd, (0, 0))
+
+    def grab(self, left, top, width, height):
+        sct_img = self.sct.grab({"top": top, "left": left, "width": width, "height": height})
+        return np.frombuffer(sct_img.raw, np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+    def close(self):
+        self.sct.close()
+
+
+class ReplayBackend(CaptureBackend):
+    '''
+    Replays recorded full-window frames, so the capture path can be exercised without a game window.
+    frames: list of RGB arrays, PIL images or image file paths, all the size of the client area
+    advance: move to the next frame after every grab, otherwise call next() explicitly
+    '''
+    pixelFormat = 'RGB'
+
+    def __init__(self, frames, origin=(0, 0), advance=False):
+        self.frames = list(frames)
+        self.origin = tuple(origin)
+        self.advance = advance
+        self.index = 0
+        self._cache = {}
+
+    def frame(self):
+        if self.index not in self._cache:
+            frame = self.frames[self.index]
+            if isinstance(frame, str):
+                frame = Image.open(frame)
+            self._cache[self.index] = np.asarray(frame.convert('RGB') if isinstance(frame, Image.Image) else frame,
+                                                 np.uint8)
+        return self._cache[self.index]
+
+    def next(self):
+        self.index = min(self.index + 1, len(self.frames) - 1)
+
+    def windowRect(self):
+        h, w = self.frame().shape[:2]
+        return self.origin[0], self.origin[1], self.origin[0] + w, self.origin[1] + h
+
+    def clientOrigin(self):
+        return self.origin
+
+    def grab(self, left, top, width, height):
+        left -= self.origin[0]
+        top -= self.origin[1]
+        result = self.frame()[top:top + height, left:left + width]
+        if self.advance:
+            self.next()
+        return result
+
+
+class CaptureSession:
+    '''
+    Long-lived frame grabber for one scan.
+    The client origin of the window is cached and only looked up again after the window moved or resized,
+    which is checked at most once per check_interval seconds. Output arrays are reused per size.
+    '''
+
+    def __init__(self, backend, check_interval=0.5):
+        self.backend = backend
+        self.check_interval = check_interval
+        self._origin = None
+        self._window_rect = None
+        self._last_check = 0
+        self._buffers = {}
+
+    def invalidate(self):
+        self._origin = None
+
+    def origin(self):
+        now = time.time()
+        if self._origin is None or now - self._last_check > self.check_interval:
+            window_rect = self.backend.windowRect()
+            if self._origin is None or window_rect != self._window_rect:
+                self._window_rect = window_rect
+                self._origin = self.backend.clientOrigin()
+            self._last_check = now
+        return self._origin
+
+    def grabArray(self, local_rect):
+        '''
+        local_rect: (left, top, right, bottom) in client coordinates
+        returns an RGB array which is overwritten by the next grab of the same size
+        '''
+        left, top, right, bottom = [int(round(i)) for i in local_rect]
+        origin_x, origin_y = self.origin()
+        frame = self.backend.grab(left + origin_x, top + origin_y, right - left, bottom - top)
+        buffer = self._buffers.get(frame.shape[:2])
+        if buffer is None:
+            buffer = self._buffers[frame.shape[:2]] = np.empty((*frame.shape[:2], 3), np.uint8)
+        if self.backend.pixelFormat == 'BGRA':
+            np.copyto(buffer, frame[..., 2::-1])
+        else:
+            np.copyto(buffer, frame[..., :3])
+        return buffer
+
+    def grab(self, local_rect):
+        return Image.fromarray(self.grabArray(local_rect))
+
+    def close(self):
+        self.backend.close()
+        self._buffers.clear()
+
+
+class ProbeFrame:
+    '''
+    One grab answering every probe of a ProbeSet. Probe results are views on the grabbed frame,
+    which is overwritten by the next tick of the same ProbeSet.
+    '''
+
+    def __init__(self, probes, image):
+        self.probes = probes
+        self.image = image
+
+    def pixel(self, name):
+        x, y = self.probes.local_pixels[name]
+        return self.image[y, x]
+
+    def matches(self):
+        '''
+        tests every pixel probe against its colour at once, returns {name: bool}
+        '''
+        probes = self.probes
+        if len(probes.pixel_names) == 0:
+            return {}
+        pix = self.image[probes.ys, probes.xs].astype(np.int16)
+        result = (np.abs(pix - probes.colors) <= probes.tols[:, None]).all(axis=1)
+        return dict(zip(probes.pixel_names, result.tolist()))
+
+    def match(self, name):
+        color, tol = self.probes.pixel_colors[name]
+        return bool((np.abs(self.pixel(name).astype(np.int16) - color) <= tol).all())
+
+    def region(self, name):
+        left, top, right, bottom = self.probes.local_regions[name]
+        return self.image[top:bottom, left:right]
+
+    def changed(self, name, reference, tol=5):
+        '''
+        strip diff: whether any pixel of the region differs from reference by more than tol
+        '''
+        return bool(np.abs(self.region(name).astype(np.int16) - reference).max() > tol)
+
+    def regionMatches(self, name, color, tol=5, ratio=0.5):
+        '''
+        tile check: whether at least ratio of the region is within tol of color
+        '''
+        close = (np.abs(self.region(name).astype(np.int16) - color) <= tol).all(axis=-1)
+        return bool(close.mean() >= ratio)
+
+
+class ProbeSet:
+    '''
+    Named probes (key pixels and regions, in client coordinates) answered from a single grab per tick.
+    Only the part of the client area covering all probes is grabbed.
+    '''
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.pixels = {}
+        self.pixel_colors = {}
+        self.regions = {}
+        self._bbox = None
+
+    def addPixel(self, name, x, y, color=(0, 0, 0), tol=5):
+        self.pixels[name] = (int(round(x)), int(round(y)))
+        self.pixel_colors[name] = (np.array(color, np.int16), tol)
+        self._bbox = None
+        return self
+
+    def addRegion(self, name, rect):
+        self.regions[name] = tuple(int(round(i)) for i in rect)
+        self._bbox = None
+        return self
+
+    def _layout(self):
+        rects = [(x, y, x + 1, y + 1) for x, y in self.pixels.values()] + list(self.regions.values())
+        left, top = min(i[0] for i in rects), min(i[1] for i in rects)
+        self._bbox = (left, top, max(i[2] for i in rects), max(i[3] for i in rects))
+        # probe coordinates relative to the grabbed rectangle
+        self.local_pixels = {k: (x - left, y - top) for k, (x, y) in self.pixels.items()}
+        self.local_regions = {k: (l - left, t - top, r - left, b - top) for k, (l, t, r, b) in self.regions.items()}
+        self.pixel_names = list(self.pixels.keys())
+        self.xs = np.array([self.local_pixels[k][0] for k in self.pixel_names], np.intp)
+        self.ys = np.array([self.local_pixels[k][1] for k in self.pixel_names], np.intp)
+        self.colors = np.array([self.pixel_colors[k][0] for k in self.pixel_names], np.int16).reshape(-1, 3)
+        self.tols = np.array([self.pixel_colors[k][1] for k in self.pixel_names], np.int16)
+
+    def tick(self):
+        if self._bbox is None:
+            self._layout()
+        return ProbeFrame(self, self.capture.grabArray(self._bbox))
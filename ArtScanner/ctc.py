@@ -0,0 +1,130 @@
+import numpy as np
+
+
+def char_table(characters):
+    '''
+    index -> character of the model output: 0 is the mask token, then the characters, the last class is the blank
+    '''
+    return np.array(['', *characters, ''], dtype=object)
+
+
+def greedy_decode(pred, table, max_length):
+    '''
+    Best path CTC decoding, the same as keras ctc_decode(greedy=True) followed by the StringLookup of the model:
+    take the most likely class per time step, collapse repeats, drop blanks and keep at most max_length tokens.
+    pred: softmax output of shape (batch, time steps, classes)
+    returns the texts and, per text, the probability of each character
+    '''
+    pred = np.asarray(pred)
+    best = pred.argmax(axis=-1)
+    prob = np.take_along_axis(pred, best[..., None], axis=-1)[..., 0]
+    keep = best != pred.shape[-1] - 1
+    keep[:, 1:] &= best[:, 1:] != best[:, :-1]
+    keep &= np.cumsum(keep, axis=1) <= max_length
+    # the mask token counts towards max_length but has no character
+    keep &= best != 0
+    texts = []
+    probabilities = []
+    for i in range(len(best)):
+        texts.append(''.join(table[best[i, keep[i]]]))
+        probabilities.append(prob[i, keep[i]])
+    return texts, probabilities
+
+
+class Lexicon:
+    '''
+    Prefix trie of the valid texts of a field (e.g. artifact names), stored as arrays for lexicon_decode.
+    Node 0 is the root, every other node appends its label, the model output class of one character, to its parent.
+    Words with a character the model cannot output are left out.
+    '''
+
+    def __init__(self, words, characters):
+        classes = {c: i + 1 for i, c in enumerate(characters)}
+        parent = [0]
+        label = [0]
+        children = [{}]
+        terminals = {}
+        for word in dict.fromkeys(words):
+            if not word or any(c not in classes for c in word):
+                continue
+            node = 0
+            for c in word:
+                if c not in children[node]:
+                    children[node][c] = len(parent)
+                    parent.append(node)
+                    label.append(classes[c])
+                    children.append({})
+                node = children[node][c]
+            terminals[node] = word
+        self.parent = np.array(parent)
+        self.label = np.array(label)
+        # CTC collapses repeats, a character equal to its parent's can only follow it after a blank
+        self.repeat = self.label == self.label[self.parent]
+        self.repeat[0] = True
+        self.terminals = np.array(list(terminals))
+        self.words = list(terminals.values())
+
+    def __len__(self):
+        return len(self.words)
+
+
+def lexicon_decode(pred, lexicon):
+    '''
+    Best path CTC decoding restricted to the words of lexicon, in one pass over the time steps that extends
+    every node of the trie at once, so words sharing a prefix share its work.
+    pred: softmax output of shape (batch, time steps, classes)
+    returns, per line, the best word, the probability of each character (at its first frame on the best path)
+    and the score of the word: the probability of its best path relative to the best unconstrained path,
+    1 when greedy decoding reads the same word
+    '''
+    pred = np.asarray(pred, np.float64)
+    batch, steps, _ = pred.shape
+    with np.errstate(divide='ignore'):
+        log_pred = np.log(pred)
+        # the mask token emits nothing either, it separates repeats like the blank
+        log_blank = np.log(pred[..., -1] + pred[..., 0])
+    log_emit = log_pred[:, :, lexicon.label]
+    nodes = len(lexicon.label)
+    # best log probability of the paths ending at each node, after a blank or on its character
+    blank = np.full((batch, nodes), -np.inf)
+    blank[:, 0] = 0
+    char = np.full((batch, nodes), -np.inf)
+    # back pointers: the char state came from the parent instead of staying, from the parent's char state
+    # instead of its blank, the blank state came from the char state instead of staying
+    moved = np.empty((steps, batch, nodes), bool)
+    from_char = np.empty((steps, batch, nodes), bool)
+    blank_from = np.empty((steps, batch, nodes), bool)
+    no_repeat = np.where(lexicon.repeat, -np.inf, 0)
+    for t in range(steps):
+        parent_blank = blank[:, lexicon.parent]
+        parent_char = char[:, lexicon.parent] + no_repeat
+        np.greater(parent_char, parent_blank, out=from_char[t])
+        parent = np.maximum(parent_blank, parent_char)
+        np.greater(parent, char, out=moved[t])
+        np.greater(char, blank, out=blank_from[t])
+        blank = np.maximum(blank, char) + log_blank[:, t, None]
+        char = np.maximum(char, parent) + log_emit[:, t]
+        char[:, 0] = -np.inf
+
+    final = np.maximum(blank, char)[:, lexicon.terminals]
+    best = final.argmax(axis=1)
+    unconstrained = np.maximum(log_pred[..., 1:-1].max(axis=-1), log_blank).sum(axis=1)
+    words = []
+    probabilities = []
+    scores = []
+    for i in range(batch):
+        node = lexicon.terminals[best[i]]
+        on_char = char[i, node] >= blank[i, node]
+        frames = []
+        for t in range(steps - 1, -1, -1):
+            if not on_char:
+                on_char = blank_from[t, i, node]
+                continue
+            if moved[t, i, node]:
+                frames.append((t, node))
+                on_char = from_char[t, i, node]
+                node = lexicon.parent[node]
+        words.append(lexicon.words[best[i]])
+        probabilities.append(np.array([pred[i, t, lexicon.label[node]] for t, node in reversed(frames)]))
+        scores.append(float(np.exp(final[i, best[i]] - unconstrained[i])))
+    return words, probabilities, scores
@@ -0,0 +1,298 @@
+'''
+Tables of artifact stats compiled from the game's Excel configs in Tools, loaded lazily on first use.
+The compiled tables are cached in Tools/game_data.json and rebuilt whenever a config changes.
+Run it before packaging to ship the cache with the bundle:
+
+    python game_data.py
+'''
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+import ArtsInfo
+
+bundle_dir = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
+
+AFFIX_CONFIG = os.path.join(bundle_dir, 'Tools', 'ReliquaryAffixExcelConfigData.json')
+LEVEL_CONFIG = os.path.join(bundle_dir, 'Tools', 'ReliquaryLevelExcelConfigData.json')
+CACHE = os.path.join(bundle_dir, 'Tools', 'game_data.json')
+# a substat of a +20 artifact rolled at most once when it appeared and once per 4 levels
+MAX_ROLLS = 6
+MAX_LEVEL = 20
+# stats shown as percentages, display_value counts them in tenths of a percent
+PERCENT_STATS = frozenset(stat for stat, text in ArtsInfo.Formats.items() if '%' in text)
+
+_lock = threading.Lock()
+_tables = None
+
+
+def display_value(stat, value):
+    '''
+    value as shown in game, as an integer: tenths of a percent for percentages, whole points otherwise
+    stat: name of ArtsInfo.Formats, e.g. 'FIGHT_PROP_CRITICAL'
+    '''
+    text = ArtsInfo.Formats[stat].format(value + 1e-5)
+    return int(text.replace(',', '').replace('.', '').replace('%', ''))
+
+
+def decode_value(text):
+    '''
+    value of a stat as read, e.g. '+12', '1,234' or '3.5%' (as 0.035), anything but a string is returned as it is
+    '''
+    if type(text) != str:
+        return text
+    if "%" in text:
+        return float(text[:-1]) / 100
+    else:
+        return int(text.replace(',', '').replace('+', ''))
+
+
+def _load_json(path):
+    with open(path, 'rb') as f:
+        return json.load(f)
+
+
+def _digest(paths):
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def parse_substat_tiers(path=AFFIX_CONFIG):
+    '''
+    returns {stat: {rarity: sorted values of a single roll}} from ReliquaryAffixExcelConfigData.json
+    '''
+    tiers = {stat: {rarity: [] for rarity in range(1, 6)} for stat in ArtsInfo.SubAttrNames}
+    for affix in _load_json(path):
+        rarity = affix['DepotId'] // 100
+        if affix['PropType'] in tiers and affix['DepotId'] % 100 == 1 and rarity in tiers[affix['PropType']]:
+            tiers[affix['PropType']][rarity].append(affix['PropValue'])
+    return {stat: {rarity: sorted(values) for rarity, values in rarities.items()} for stat, rarities in tiers.items()}
+
+
+def parse_main_stats(path=LEVEL_CONFIG):
+    '''
+    returns {stat: {rarity: main stat value at level 0 to MAX_LEVEL, None for levels missing from the config}}
+    from ReliquaryLevelExcelConfigData.json, which lists every rarity up to +20
+    '''
+    main_stats = {}
+    for record in _load_json(path):
+        rarity = record.get('Rank')
+        level = record['Level'] - 1
+        if rarity is None or not 0 <= level <= MAX_LEVEL:
+            continue
+        for prop in record['AddProps']:
+            values = main_stats.setdefault(prop['PropType'], {}).setdefault(rarity, [None] * (MAX_LEVEL + 1))
+            values[level] = prop['Value']
+    return main_stats
+
+
+def build_roll_tables(tiers):
+    '''
+    returns {stat: {rarity: {displayed value: roll counts}}}: every value a substat can show after 1 to MAX_ROLLS
+    rolls, and the numbers of rolls that can add up to it
+    '''
+    tables = {}
+    for stat, rarities in tiers.items():
+        tables[stat] = {}
+        for rarity, values in rarities.items():
+            table = {}
+            for rolls in range(1, MAX_ROLLS + 1) if values else ():
+                for combination in itertools.combinations_with_replacement(values, rolls):
+                    counts = table.setdefault(display_value(stat, sum(combination)), [])
+                    if rolls not in counts:
+                        counts.append(rolls)
+            tables[stat][rarity] = table
+    return tables
+
+
+def compile_tables():
+    '''
+    parses the configs, returns the tables in the form stored in the cache
+    '''
+    tiers = parse_substat_tiers()
+    return {'substat_tiers': tiers, 'roll_tables': build_roll_tables(tiers), 'main_stats': parse_main_stats()}
+
+
+def _int_keys(tables):
+    '''
+    JSON stores the rarities and displayed values of the tables as strings
+    '''
+    return {
+        'substat_tiers': {stat: {int(rarity): values for rarity, values in rarities.items()}
+                          for stat, rarities in tables['substat_tiers'].items()},
+        'roll_tables': {stat: {int(rarity): {int(value): tuple(counts) for value, counts in table.items()}
+                               for rarity, table in rarities.items()}
+                        for stat, rarities in tables['roll_tables'].items()},
+        'main_stats': {stat: {int(rarity): values for rarity, values in rarities.items()}
+                       for stat, rarities in tables['main_stats'].items()},
+    }
+
+
+def _index_substat_values(roll_tables):
+    '''
+    returns {stat: {rarity: [sorted values a substat can show after at most max_rolls rolls, for max_rolls from 0]}}
+    '''
+    return {stat: {rarity: [sorted(value for value, counts in table.items() if min(counts) <= max_rolls)
+                            for max_rolls in range(MAX_ROLLS + 1)]
+                   for rarity, table in rarities.items()}
+            for stat, rarities in roll_tables.items()}
+
+
+def _index_main_stats(main_stats):
+    '''
+    returns {stat: {rarity: value shown (display_value) at each level, None past the max level of the rarity}}
+    and {stat: {rarity: {value shown: levels showing it}}}, only levels the rarity can reach (ArtsInfo.RarityToMaxLvs)
+    '''
+    shown = {}
+    levels = {}
+    for stat, rarities in main_stats.items():
+        if stat not in ArtsInfo.Formats:
+            continue
+        shown[stat] = {}
+        levels[stat] = {}
+        for rarity, values in rarities.items():
+            max_level = ArtsInfo.RarityToMaxLvs[rarity - 1]
+            shown[stat][rarity] = [None if value is None or level > max_level else display_value(stat, value)
+                                   for level, value in enumerate(values)]
+            levels[stat][rarity] = {}
+            for level, raw in enumerate(shown[stat][rarity]):
+                if raw is not None:
+                    levels[stat][rarity].setdefault(raw, []).append(level)
+    return shown, levels
+
+
+def build(path=CACHE):
+    '''
+    the build step: compiles the configs into the cache at path
+    '''
+    data = {'source': _digest([AFFIX_CONFIG, LEVEL_CONFIG]), **compile_tables()}
+    with open(path, 'wb') as f:
+        f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+    return data
+
+
+def tables():
+    '''
+    the compiled tables, loaded from CACHE on first use, compiled (and cached if possible) when the cache is
+    missing or was built from other configs
+    '''
+    global _tables
+    with _lock:
+        if _tables is None:
+            data = None
+            try:
+                data = _load_json(CACHE)
+            except (OSError, ValueError):
+                pass
+            if data is None or data.get('source') != _digest([AFFIX_CONFIG, LEVEL_CONFIG]):
+                try:
+                    data = build(CACHE)
+                except OSError:
+                    data = compile_tables()
+                # the same form as loaded from JSON
+                data = json.loads(json.dumps(data))
+            _tables = _int_keys(data)
+            _tables['substat_values'] = _index_substat_values(_tables['roll_tables'])
+            _tables['main_stat_raw'], _tables['main_stat_levels'] = _index_main_stats(_tables['main_stats'])
+        return _tables
+
+
+def substat_tiers():
+    return tables()['substat_tiers']
+
+
+def roll_tables():
+    return tables()['roll_tables']
+
+
+def substat_roll_counts(stat, rarity, raw, max_rolls=MAX_ROLLS):
+    '''
+    returns the numbers of rolls (at most max_rolls) a substat needs to show raw (see display_value),
+    empty if it cannot show it
+    '''
+    counts = roll_tables()[stat][rarity].get(raw, ())
+    return [i for i in counts if i <= max_rolls]
+
+
+def substat_values(stat, rarity, max_rolls=MAX_ROLLS):
+    '''
+    returns the sorted values a substat can show after at most max_rolls rolls (see display_value)
+    '''
+    return tables()['substat_values'][stat][rarity][min(max_rolls, MAX_ROLLS)]
+
+
+def _one_edit(text):
+    '''
+    the digit strings one insertion, deletion or substitution away from text
+    '''
+    edits = set()
+    for i in range(len(text) + 1):
+        for digit in '0123456789':
+            edits.add(text[:i] + digit + text[i:])
+            if i < len(text):
+                edits.add(text[:i] + digit + text[i + 1:])
+        if i < len(text):
+            edits.add(text[:i] + text[i + 1:])
+    edits.discard(text)
+    return [edit for edit in edits if edit and (edit == '0' or not edit.startswith('0'))]
+
+
+def snap_substat(stat, rarity, raw, max_rolls=MAX_ROLLS):
+    '''
+    returns [raw] if a substat can show raw after at most max_rolls rolls, else the values it can show whose digits
+    are a single edit (one digit misread, dropped or doubled, or the decimal point dropped) away from raw's,
+    nearest first
+    '''
+    values = substat_values(stat, rarity, max_rolls)
+
+    def legal(value):
+        i = bisect.bisect_left(values, value)
+        return i < len(values) and values[i] == value
+
+    if legal(raw):
+        return [raw]
+    return sorted((value for value in map(int, _one_edit(str(raw))) if legal(value)), key=lambda i: abs(i - raw))
+
+
+def main_stat_raw(stat, rarity, level):
+    '''
+    returns the main stat an artifact of rarity shows at level (see display_value), None if it cannot reach the level
+    '''
+    values = tables()['main_stat_raw'].get(stat, {}).get(rarity)
+    if values is None or not isinstance(level, int) or not 0 <= level <= MAX_LEVEL:
+        return None
+    return values[level]
+
+
+def main_stat_levels(stat, rarity, raw):
+    '''
+    returns the levels at which the main stat of an artifact of rarity shows raw
+    '''
+    return tables()['main_stat_levels'].get(stat, {}).get(rarity, {}).get(raw, ())
+
+
+def infer_level(stat, rarity, raw, level):
+    '''
+    level: the level as read, None if it could not be read
+    returns the read level if the rarity can reach it, even if the main stat was misread, else the only level
+    at which the main stat shows raw, else the read level
+    '''
+    if isinstance(level, int) and 0 < rarity <= len(ArtsInfo.RarityToMaxLvs) and \
+            0 <= level <= ArtsInfo.RarityToMaxLvs[rarity - 1]:
+        return level
+    levels = main_stat_levels(stat, rarity, raw)
+    return levels[0] if len(levels) == 1 else level
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    build()
+    print(f'compiled {CACHE} ({os.path.getsize(CACHE) / 1024:.1f}KB) in {time.perf_counter() - start:.3f}s')
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import queue
+import threading
+
+from PIL import Image
+
+
+class ImageStore:
+    '''
+    Content-addressed store of artifact images on disk. put() returns a reference, the hex digest of the pixels,
+    and a background thread compresses the image to directory/<reference>.png. An image is written once however
+    often it is put, and files left by earlier scans are reused.
+    Images waiting to be written stay in memory, get() serves them from there; put() blocks while maxsize images
+    are waiting (back-pressure). An exception raised writing an image is re-raised once, by the next put()
+    or by close(), later images are written as usual.
+    '''
+
+    def __init__(self, directory, maxsize=16, compress_level=1):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compress_level = compress_level
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.known = set()
+        self.error = None
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def reference(image):
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+        digest.update(f'{image.mode}{image.size}'.encode())
+        return digest.hexdigest()
+
+    def path(self, ref):
+        return os.path.join(self.directory, ref + '.png')
+
+    def put(self, image):
+        '''
+        image: PIL.Image, not to be modified afterwards
+        returns the reference of image
+        '''
+        self._raiseError()
+        ref = self.reference(image)
+        with self.lock:
+            if ref in self.known:
+                return ref
+            self.known.add(ref)
+            self.pending[ref] = image
+        self.queue.put(ref)
+        return ref
+
+    def get(self, ref):
+        with self.lock:
+            image = self.pending.get(ref)
+        if image is None:
+            image = Image.open(self.path(ref))
+            image.load()
+        return image
+
+    def close(self):
+        '''
+        waits until every image is written and stops the writer
+        '''
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self._raiseError()
+
+    def _raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _work(self):
+        while True:
+            ref = self.queue.get()
+            if ref is None:
+                return
+            try:
+                path = self.path(ref)
+                if not os.path.exists(path):
+                    # written under another name first, a crash leaves no truncated image under its reference
+                    self.pending[ref].save(path + '.tmp', 'PNG', compress_level=self.compress_level)
+                    os.replace(path + '.tmp', path)
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+            finally:
+                with self.lock:
+                    del self.pending[ref]
@@ -0,0 +1,53 @@
+import functools
+
+import numpy as np
+
+# fixed point precision of PIL's 8 bit resampling
+PRECISION_BITS = 32 - 8 - 2
+
+
+@functools.lru_cache(maxsize=2048)
+def bilinear_taps(in_size, out_size):
+    '''
+    PIL's BILINEAR resampling along one axis (antialiased when shrinking) as a gather:
+    output i is sum(input[index[i]] * weights[i]), weights are PIL's fixed point coefficients
+    '''
+    scale = in_size / out_size
+    filterscale = max(scale, 1.)
+    weights = np.zeros((out_size, in_size))
+    for i in range(out_size):
+        center = (i + 0.5) * scale
+        lo = max(int(center - filterscale + 0.5), 0)
+        hi = min(int(center + filterscale + 0.5), in_size)
+        w = np.clip(1 - np.abs((np.arange(lo, hi) - center + 0.5) / filterscale), 0, None)
+        if w.sum() > 0:
+            weights[i, lo:hi] = w / w.sum()
+    weights = np.round(weights * (1 << PRECISION_BITS))
+    nonzero = weights > 0
+    taps = nonzero.sum(axis=1).max()
+    start = np.minimum(nonzero.argmax(axis=1), in_size - taps)
+    index = start[:, None] + np.arange(taps)
+    weights = np.take_along_axis(weights, index, axis=1)
+    index.setflags(write=False)
+    weights.setflags(write=False)
+    return index, weights
+
+
+def _round_pass(result):
+    return np.clip(np.floor((result + (1 << PRECISION_BITS - 1)) / (1 << PRECISION_BITS)), 0, 255)
+
+
+def resize_bilinear(img, width, height):
+    '''
+    img: 2D image with values in [0, 1]
+    returns the same as Image.fromarray(np.uint8(img * 255)).resize((width, height), Image.BILINEAR) / 255
+    '''
+    result = np.floor(img * 255).astype(np.float64)
+    # PIL resizes horizontally first and rounds to 8 bits after each pass
+    if width != img.shape[1]:
+        index, weights = bilinear_taps(img.shape[1], width)
+        result = _round_pass(np.einsum('ijk,jk->ij', result[:, index], weights))
+    if height != img.shape[0]:
+        index, weights = bilinear_taps(img.shape[0], height)
+        result = _round_pass(np.einsum('ikj,ik->ij', result[index], weights))
+    return result / 255
@@ -5,6 +5,7 @@ import sys
 import time
 
 import mouse
+from PIL import Image
 
 import ocr
 from art_saver import ArtDatabase
@@ -96,7 +97,8 @@ game_info.calculateCoordinates()
 # margin near level number, color=233,229,220
 
 # initialization
-ocr_model = ocr.OCR(scale_ratio=game_info.scale_ratio, model_weight=os.path.join(bundle_dir, 'weights-improvement-55-1.00.hdf5'))
+ocr_model = ocr.OCR(scale_ratio=game_info.scale_ratio, model_weight=os.path.join(bundle_dir, 'weights-improvement-55-1.00.hdf5'),
+                    saved_model=os.path.join(bundle_dir, 'ocr_saved_model'))
 art_id = 0
 saved = 0
 skipped = 0
@@ -129,7 +131,7 @@ setWindowToForeground(hwnd)
 time.sleep(5)
 
 art_scanner = ArtScannerLogic(game_info)
-art_data = ArtDatabase('artifacts.dat')
+art_data = ArtDatabase()
 
 try:
     level_threshold = int(level_threshold)
@@ -166,6 +168,8 @@ def artscannerCallback(art_img):
     global failed
     global star_dist
     info = ocr_model.detect_info(art_img)
+    # art_img views the capture buffer, copy it out before it is kept or saved
+    art_img = Image.fromarray(art_img)
     star_dist[info['star'] - 1] += 1
     if decodeValue(info['level']) < level_threshold or decodeValue(info['star']) < rarity_threshold:
         skipped += 1
@@ -189,7 +193,8 @@ def artscannerCallback(art_img):
 try:
     while True:
         if art_scanner.stopped or not art_scanner.scanRows(rows=range(start_row, game_info.art_rows),
-                                                           callback=artscannerCallback) or start_row != 0:
+                                                           callback=artscannerCallback,
+                                                           as_array=True) or start_row != 0:
             break
         start_row = game_info.art_rows - art_scanner.scrollToRow(game_info.art_rows, max_scrolls=20,
                                                                  extra_scroll=int(game_info.art_rows > 5),
@@ -206,8 +211,10 @@ try:
 except Exception as e:
     print()
     print(f"因为\"{repr(e)}\"而意外停止扫描，将保存已扫描的圣遗物信息")
+art_scanner.close()
 if saved != 0:
     exporter(export_name)
+art_data.close()
 print(f'总计扫描了{skipped + saved}/{art_id}个圣遗物，保存了{saved}个到{export_name}，失败了{failed}个')
 print('无效识别/失败结果请到artifacts路径中查看')
 print('----------------------------')
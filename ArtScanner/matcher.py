@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import Levenshtein
+
+import ArtsInfo
+
+
+class BKTree:
+    '''
+    Burkhard-Keller tree of words under the Levenshtein distance. A child hangs off its parent by their distance,
+    so by the triangle inequality a search only has to enter the children whose edge is within the best distance
+    found so far of the query's distance to the node.
+    '''
+
+    def __init__(self, words):
+        # node: [word, insertion order, {distance: child}]
+        self.root = None
+        for order, word in enumerate(words):
+            self.add(word, order)
+
+    def add(self, word, order):
+        node = [word, order, {}]
+        if self.root is None:
+            self.root = node
+            return
+        parent = self.root
+        while True:
+            distance = Levenshtein.distance(word, parent[0])
+            if distance == 0:
+                return
+            if distance not in parent[2]:
+                parent[2][distance] = node
+                return
+            parent = parent[2][distance]
+
+    def nearest(self, word):
+        '''
+        returns the closest word and its distance, of equally close words the one added first
+        '''
+        best = (float('inf'), 0, None)
+        # (lower bound of the distances in the subtree, node), the most promising child is searched first
+        stack = [(0, self.root)]
+        while stack:
+            bound, node = stack.pop()
+            if bound > best[0]:
+                continue
+            distance = Levenshtein.distance(word, node[0])
+            if (distance, node[1]) < best[:2]:
+                best = (distance, node[1], node[0])
+            children = [(abs(distance - edge), child) for edge, child in node[2].items()]
+            stack += sorted((i for i in children if i[0] <= best[0]), key=lambda i: -i[0])
+        return best[2], best[0]
+
+
+class Matcher:
+    '''
+    Corrects OCR text to the closest known word: known words are found in a dict, raw strings seen before in a memo,
+    only new misreads search the BK-tree. Safe to share between OCR threads.
+    values: what match returns for each word, the words themselves by default
+    '''
+
+    def __init__(self, words, values=None, memo_size=4096):
+        words = list(words)
+        self.exact = {}
+        for word, value in zip(words, words if values is None else values):
+            self.exact.setdefault(word, value)
+        self.tree = BKTree(words)
+        self.memo = OrderedDict()
+        self.memo_size = memo_size
+        self.lock = threading.Lock()
+
+    def match(self, text):
+        '''
+        returns the value of the closest word and the distance to it
+        '''
+        if text in self.exact:
+            return self.exact[text], 0
+        with self.lock:
+            if text in self.memo:
+                self.memo.move_to_end(text)
+                return self.memo[text]
+        word, distance = self.tree.nearest(text)
+        result = self.exact[word], distance
+        with self.lock:
+            self.memo[text] = result
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return result
+
+
+def artifact_matcher(art_names, slot=None):
+    '''
+    art_names: names of every set by slot, ArtsInfo.ArtNames or ArtsInfo.ArtNames_EN
+    slot: only match the names of this slot (index of ArtsInfo.TypeNames), None for all
+    matches artifact names to (name, set id, slot)
+    '''
+    words = []
+    values = []
+    for setid, arts in enumerate(art_names):
+        for i, name in enumerate(arts):
+            # the sets with a single artifact only have a circlet
+            name_slot = i if len(arts) == len(ArtsInfo.TypeNames) else len(ArtsInfo.TypeNames) - 1
+            if slot is None or name_slot == slot:
+                words.append(name)
+                values.append((name, setid, name_slot))
+    return Matcher(words, values)
+
+
+class ArtifactResolver:
+    '''
+    Corrects name, type and main stat of an artifact together. The name of each set and the main stats are
+    restricted by the slot, so when the fields are read exactly the name is only looked up among the names of
+    the slot read from the type. Otherwise every slot is tried and the one needing the fewest edits over the
+    three fields wins, ties going to the slot read from the type. Fields the OCR is confident about and read as a
+    known word pin the slot: only the slots they fit are tried, unless the confident fields disagree.
+    art_names, type_names, main_attr_names: ArtsInfo.ArtNames, TypeNames and MainAttrNames (or their _EN twins)
+    '''
+
+    def __init__(self, art_names, type_names, main_attr_names):
+        self.type_names = type_names
+        self.types = Matcher(type_names, range(len(type_names)))
+        self.slot_names = [artifact_matcher(art_names, slot) for slot in range(len(type_names))]
+        self.slot_attrs = [Matcher(main_attr_names[key] for key in keys) for keys in ArtsInfo.TypeMainAttrs]
+
+    def resolve(self, name, type, main_attr_name, confident=()):
+        '''
+        confident: the fields ('name', 'type', 'main_attr_name') the OCR is confident about
+        returns a dict of the corrected 'name', 'setid', 'slot', 'type' and 'main_attr_name',
+        and the (field, read text, corrected text) of every field that was corrected
+        '''
+        slot, type_distance = self.types.match(type)
+        if type_distance == 0 and name in self.slot_names[slot].exact and main_attr_name in self.slot_attrs[slot].exact:
+            setid = self.slot_names[slot].exact[name][1]
+            return {'name': name, 'setid': setid, 'slot': slot, 'type': type, 'main_attr_name': main_attr_name}, []
+        slots = set(range(len(self.type_names)))
+        if 'type' in confident and type in self.types.exact:
+            slots &= {self.types.exact[type]}
+        if 'name' in confident:
+            slots &= {i for i, names in enumerate(self.slot_names) if name in names.exact}
+        if 'main_attr_name' in confident:
+            slots &= {i for i, attrs in enumerate(self.slot_attrs) if main_attr_name in attrs.exact}
+        if not slots:
+            slots = set(range(len(self.type_names)))
+        # the edits of a slot are at least its type distance, plus one for a name or main stat that is not a word of
+        # the slot; slots are tried from the lowest bound until it exceeds the best slot found, so most reads only
+        # search the names of a single slot
+        type_distances = {i: Levenshtein.distance(type, self.type_names[i]) for i in slots}
+        bounds = {i: type_distances[i] + (name not in self.slot_names[i].exact) +
+                  (main_attr_name not in self.slot_attrs[i].exact) for i in slots}
+        candidates = []
+        for i in sorted(slots, key=lambda i: (bounds[i], i != slot)):
+            if candidates and bounds[i] > min(candidates)[0]:
+                break
+            (corr_name, setid, _), name_distance = self.slot_names[i].match(name)
+            corr_attr, attr_distance = self.slot_attrs[i].match(main_attr_name)
+            distance = name_distance + attr_distance + type_distances[i]
+            candidates.append((distance, i != slot, i, corr_name, setid, corr_attr))
+        _, _, slot, corr_name, setid, corr_attr = min(candidates)
+        resolved = {'name': corr_name, 'setid': setid, 'slot': slot, 'type': self.type_names[slot],
+                    'main_attr_name': corr_attr}
+        read = {'name': name, 'type': type, 'main_attr_name': main_attr_name}
+        return resolved, [(key, text, resolved[key]) for key, text in read.items() if text != resolved[key]]
+
+
+name_matcher = artifact_matcher(ArtsInfo.ArtNames)
+attr_matcher = Matcher(ArtsInfo.MainAttrNames.values())
+resolver = ArtifactResolver(ArtsInfo.ArtNames, ArtsInfo.TypeNames, ArtsInfo.MainAttrNames)
+name_matcher_EN = artifact_matcher(ArtsInfo.ArtNames_EN)
+attr_matcher_EN = Matcher(ArtsInfo.MainAttrNames_EN.values())
+resolver_EN = ArtifactResolver(ArtsInfo.ArtNames_EN, ArtsInfo.TypeNames_EN, ArtsInfo.MainAttrNames_EN)
@@ -3,19 +3,16 @@ import os
 os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # see issue #152
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import threading
+import time
 import numpy as np
 from PIL import Image
 import ArtsInfo
 import logging
-from tensorflow import get_logger
-from tensorflow.keras.models import Model
-from tensorflow.keras.layers.experimental.preprocessing import StringLookup
-from tensorflow.keras.layers import Input, Reshape, Dense, Dropout, Bidirectional, LSTM
-from tensorflow.keras.backend import ctc_decode
-from mobilenetv3 import MobileNetV3_Small
-from tensorflow.strings import reduce_join
-
-get_logger().setLevel(logging.ERROR)
+from ocr_backend import load_backend
+from ctc import char_table, greedy_decode, Lexicon, lexicon_decode
+from imgproc import resize_bilinear
+from ocr_cache import OCRCache, model_fingerprint
 
 
 # class OCR:
@@ -36,7 +33,16 @@ class Config_EN:
 
 
 class OCR:
-    def __init__(self, model_weight='mn_model_weight.h5', scale_ratio=1):
+    def __init__(self, model_weight='mn_model_weight.h5', scale_ratio=1, backend=None, cache=None, saved_model=None,
+                 lexicon=True):
+        '''
+        model_weight: keras weights, or a model exported by Tools/export_model.py (SavedModel / .onnx / .tflite)
+        backend: 'keras', 'savedmodel', 'onnx' or 'tflite', None to choose by the file extension of model_weight
+        cache: OCRCache of recognized lines, None for a new in-memory cache, False to recognize every line
+        saved_model: SavedModel directory exported by Tools/export_model.py, loaded instead of model_weight
+                     when it exists, falling back to model_weight if it cannot be loaded
+        lexicon: decode names, types and main stat names as the best matching known name instead of free-form
+        '''
         self.scale_ratio = scale_ratio
         self.characters = sorted(
             [
@@ -51,73 +57,261 @@ class OCR:
                 )
             ]
         )
-        # Mapping characters to integers
-        self.char_to_num = StringLookup(
-            vocabulary=list(self.characters), num_oov_indices=0, mask_token=""
-        )
-
         # Mapping integers back to original characters
-        self.num_to_char = StringLookup(
-            vocabulary=self.char_to_num.get_vocabulary(), oov_token="", mask_token="", invert=True
-        )
+        self.char_table = char_table(self.characters)
 
 
 
         self.width = 384
         self.height = 16
         self.max_length = 40
-        self.build_model(input_shape=(self.width, self.height))
-        self.model.load_weights(model_weight)
+        # preallocated model input of detect_info_batch, one per thread
+        self.batch_buffers = threading.local()
+        # field boxes of panel_layout, for the scale ratio they were computed at
+        self.layout = None
+        self.cache = OCRCache() if cache is None else cache or None
+        # lines read with a lower confidence are not cached, callers may correct or recapture them
+        self.confidence_threshold = 0.9
+        # inputs are padded to one of these batch sizes, so the compiled graph is traced at most once per size
+        self.batch_buckets = (9, 18, 36, 64)
+        # run inference through the compiled graph instead of model.predict
+        self.compiled = True
+        start = time.time()
+        self.backend = None
+        self.model_source = model_weight
+        if saved_model is not None and os.path.isdir(saved_model):
+            try:
+                self.backend = load_backend(saved_model, 'savedmodel')
+                self.model_source = saved_model
+            except Exception:
+                logging.getLogger(__name__).warning(f'failed to load {saved_model}, building the model', exc_info=True)
+        if self.backend is None:
+            self.backend = load_backend(model_weight, backend)
+        if getattr(self.backend, 'characters', None) is not None:
+            # exported models carry the vocabulary they were trained with
+            self.characters = list(self.backend.characters)
+            self.char_table = char_table(self.characters)
+        # field -> Lexicon of the texts it can have
+        self.lexicons = {}
+        if lexicon:
+            self.lexicons = {
+                'name': Lexicon(sum(ArtsInfo.ArtNames_EN, []), self.characters),
+                'type': Lexicon(ArtsInfo.TypeNames_EN, self.characters),
+                'main_attr_name': Lexicon(ArtsInfo.MainAttrNames_EN.values(), self.characters),
+            }
+        if self.backend is None:
+            # TensorFlow is only imported here, so importing this module and the exported backends stay fast
+            import tensorflow as tf
+            tf.get_logger().setLevel(logging.ERROR)
+            self.build_model(input_shape=(self.width, self.height))
+            self.model.load_weights(model_weight)
+            compiled = tf.function(lambda x: self.model(x, training=False))
+            self._infer = lambda x: compiled(x).numpy()
+        else:
+            self.model = None
+            self._infer = self.backend.predict
+        if self.cache is not None:
+            # lines cached by another model, vocabulary or decoding are not reused from a saved cache
+            self.cache.fingerprint = model_fingerprint(self.model_source, type(self.backend).__name__,
+                                                       self.characters, sorted(self.lexicons))
+        self.load_time = time.time() - start
 
     def setScaleRatio(self, scaleRatio):
         self.scale_ratio = scaleRatio
 
     def detect_info(self, art_img):
-        info = self.extract_art_info_EN(art_img)
-        x = np.concatenate([
-            self.preprocess(info[key]).T[None, :, :, None]
-            for key in sorted(info.keys())], axis=0)
-        y = self.model.predict(x)
-        y = self.decode(y)
-        return {**{key: v for key, v in zip(sorted(info.keys()), y)}, **{'star': self.detect_star(art_img)}}
+        '''
+        art_img: PIL image or RGB array of the info panel, arrays are cropped without copying
+        returns the text of every field and the star, with the confidence of each field in 'confidence'
+        and of each character in 'char_confidence', both derived from the CTC softmax output
+        '''
+        return self.detect_info_batch([art_img])[0]
+
+    def detect_info_batch(self, art_imgs, batch_size=64):
+        '''
+        art_imgs: iterable of info panels (PIL images or RGB arrays), e.g. a list, a generator or a queue reader
+        batch_size: number of text lines per inference, a batch is run whenever the next panel does not fit
+        returns one dict per panel, the same as detect_info
+        '''
+        batch_size = max(batch_size, 9)
+        x = getattr(self.batch_buffers, 'x', None)
+        if x is None or len(x) < batch_size:
+            x = self.batch_buffers.x = np.zeros((batch_size, self.width, self.height, 1), np.float32)
+        results = []
+        pending = []
+        n = 0
+        for art_img in art_imgs:
+            art_img = np.asarray(art_img)
+            keys = self.panel_fields(art_img)
+            if n + len(keys) > batch_size:
+                self._predict_batch(x, n, pending, results)
+                n = 0
+            self.preprocess_panel(art_img, keys, x[n:n + len(keys), :, :, 0])
+            # (True, (text, character probabilities)) for lines found in the cache,
+            # (False, cache key) for lines left to the model
+            lines = []
+            start = n
+            for i, key in enumerate(keys):
+                cache_key = cached = None
+                if self.cache is not None:
+                    cache_key = self.cache.key(key, x[start + i])
+                    cached = self.cache.get(cache_key)
+                if cached is not None:
+                    lines.append((True, cached))
+                    continue
+                if n != start + i:
+                    x[n] = x[start + i]
+                n += 1
+                lines.append((False, cache_key))
+            pending.append((keys, lines, self.detect_star(art_img)))
+        self._predict_batch(x, n, pending, results)
+        return results
+
+    def _predict_batch(self, x, n, pending, results):
+        y = iter([])
+        if n != 0:
+            if self.compiled or self.model is None:
+                pred = self.infer(x, n)
+            else:
+                pred = self.model.predict(x[:n], batch_size=n)
+            fields = [key for keys, lines, star in pending
+                      for key, (cached, value) in zip(keys, lines) if not cached]
+            y = zip(*self.decode(pred, return_probabilities=True, fields=fields))
+        for keys, lines, star in pending:
+            info = {}
+            confidence = {}
+            char_confidence = {}
+            for key, (cached, value) in zip(keys, lines):
+                if cached:
+                    text, probabilities = value
+                else:
+                    text, probabilities = next(y)
+                    probabilities = [round(float(i), 4) for i in probabilities]
+                info[key] = text
+                char_confidence[key] = probabilities
+                # a line is as reliable as its least certain character
+                confidence[key] = min(probabilities, default=0.)
+                if not cached and value is not None and confidence[key] >= self.confidence_threshold:
+                    self.cache.put(value, (text, probabilities))
+            results.append({**info, **{'star': star, 'confidence': confidence, 'char_confidence': char_confidence}})
+        pending.clear()
+
+    def infer(self, x, n=None):
+        '''
+        x: model input of shape (batch, width, height, 1), only the first n lines are recognized
+        runs the compiled graph (or the exported backend) on x padded to the next batch bucket,
+        returns the predictions of the n lines
+        '''
+        n = len(x) if n is None else n
+        results = []
+        for start in range(0, n, self.batch_buckets[-1]):
+            count = min(n - start, self.batch_buckets[-1])
+            bucket = next(i for i in self.batch_buckets if i >= count)
+            # rows after n are padding, their predictions are dropped
+            batch = x[start:start + bucket]
+            if len(batch) < bucket:
+                batch = np.concatenate([batch, np.zeros((bucket - len(batch), *x.shape[1:]), np.float32)])
+            results.append(self._infer(batch)[:count])
+        return np.concatenate(results)
+
+    def warmup(self):
+        '''
+        runs every batch bucket once to trace the compiled graph or allocate the backend,
+        so the first artifacts are not slowed down by it
+        '''
+        for bucket in self.batch_buckets:
+            self._infer(np.zeros((bucket, self.width, self.height, 1), np.float32))
+
+    def crop_box(self, art_img, coords):
+        # same rounding as PIL.Image.crop, returns a view
+        left, top, right, bottom = [int(round(i * self.scale_ratio)) for i in coords]
+        return art_img[top:bottom, left:right]
+
+    def is_empty_line(self, line_img):
+        # no pixel is close to the substat text color [73, 83, 102]
+        return np.all(np.abs(line_img[..., :3].astype(np.int16) - [[[73, 83, 102]]]).max(axis=-1) > 25)
+
+    def panel_layout(self):
+        '''
+        pixel boxes of the text fields and of the substat lines at the current scale ratio,
+        computed once per scale ratio
+        '''
+        if self.layout is None or self.layout[0] != self.scale_ratio:
+            boxes = {key[:-len('_coords')]: tuple(int(round(i * self.scale_ratio)) for i in value)
+                     for key, value in vars(Config_EN).items() if key.endswith('_coords') and key != 'star_coords'}
+            substats = [boxes[f'subattr_{i}'] for i in range(1, 5)]
+            substat_box = (min(i[0] for i in substats), substats[0][1], max(i[2] for i in substats), substats[-1][3])
+            self.layout = (self.scale_ratio, boxes, substat_box)
+        return self.layout[1:]
+
+    def panel_fields(self, art_img):
+        '''
+        names of the fields present on the panel in sorted order, the same fields as extract_art_info_EN
+        '''
+        boxes, (left, top, right, bottom) = self.panel_layout()
+        # one pass over the substat area: which rows have a pixel close to the substat text color [73, 83, 102]
+        area = art_img[top:bottom, left:right]
+        close = (area[..., 0] >= 73 - 25) & (area[..., 0] <= 73 + 25)
+        close &= (area[..., 1] >= 83 - 25) & (area[..., 1] <= 83 + 25)
+        close &= (area[..., 2] >= 102 - 25) & (area[..., 2] <= 102 + 25)
+        profile = close.any(axis=1)
+        lines = 0
+        for i in range(1, 5):
+            # the substat lines share their columns, so a line is present if any of its rows is
+            _, line_top, _, line_bottom = boxes[f'subattr_{i}']
+            if not profile[line_top - top:line_bottom - top].any():
+                break
+            lines = i
+        return sorted([key for key in boxes if not key.startswith('subattr_')]
+                      + [f'subattr_{i}' for i in range(1, lines + 1)])
+
+    def preprocess_panel(self, art_img, keys, out):
+        '''
+        preprocesses the fields keys of the panel into out, an array of shape (len(keys), width, height)
+        '''
+        boxes, _ = self.panel_layout()
+        for key, line in zip(keys, out):
+            left, top, right, bottom = boxes[key]
+            self.preprocess_into(art_img[top:bottom, left:right], line)
 
     def extract_art_info_EN(self, art_img):
-        name = art_img.crop([i * self.scale_ratio for i in Config_EN.name_coords])
-        type = art_img.crop([i * self.scale_ratio for i in Config_EN.type_coords])
-        main_attr_name = art_img.crop([i * self.scale_ratio for i in Config_EN.main_attr_name_coords])
-        main_attr_value = art_img.crop([i * self.scale_ratio for i in Config_EN.main_attr_value_coords])
-        level = art_img.crop([i * self.scale_ratio for i in Config_EN.level_coords])
-        subattr_1 = art_img.crop([i * self.scale_ratio for i in Config_EN.subattr_1_coords])
-        subattr_2 = art_img.crop([i * self.scale_ratio for i in Config_EN.subattr_2_coords])
-        subattr_3 = art_img.crop([i * self.scale_ratio for i in Config_EN.subattr_3_coords])
-        subattr_4 = art_img.crop([i * self.scale_ratio for i in Config_EN.subattr_4_coords])
-        if np.all(np.abs(np.array(subattr_1, np.float) - [[[73, 83, 102]]]).max(axis=-1) > 25):
+        art_img = np.asarray(art_img)
+        name = self.crop_box(art_img, Config_EN.name_coords)
+        type = self.crop_box(art_img, Config_EN.type_coords)
+        main_attr_name = self.crop_box(art_img, Config_EN.main_attr_name_coords)
+        main_attr_value = self.crop_box(art_img, Config_EN.main_attr_value_coords)
+        level = self.crop_box(art_img, Config_EN.level_coords)
+        subattr_1 = self.crop_box(art_img, Config_EN.subattr_1_coords)  # [73, 83, 102]
+        subattr_2 = self.crop_box(art_img, Config_EN.subattr_2_coords)
+        subattr_3 = self.crop_box(art_img, Config_EN.subattr_3_coords)
+        subattr_4 = self.crop_box(art_img, Config_EN.subattr_4_coords)
+        if self.is_empty_line(subattr_1):
             del subattr_1
             del subattr_2
             del subattr_3
             del subattr_4
-        elif np.all(np.abs(np.array(subattr_2, np.float) - [[[73, 83, 102]]]).max(axis=-1) > 25):
+        elif self.is_empty_line(subattr_2):
             del subattr_2
             del subattr_3
             del subattr_4
-        elif np.all(np.abs(np.array(subattr_3, np.float) - [[[73, 83, 102]]]).max(axis=-1) > 25):
+        elif self.is_empty_line(subattr_3):
             del subattr_3
             del subattr_4
-        elif np.all(np.abs(np.array(subattr_4, np.float) - [[[73, 83, 102]]]).max(axis=-1) > 25):
+        elif self.is_empty_line(subattr_4):
             del subattr_4
         return {key: value for key, value in locals().items() if key not in ['art_img', 'self']}
 
     def detect_star(self, art_img):
-        star = art_img.crop([i * self.scale_ratio for i in Config_EN.star_coords])
+        star = self.crop_box(np.asarray(art_img), Config_EN.star_coords)
         cropped_star = self.crop(self.normalize(self.to_gray(star), auto_inverse=False))
         coef = cropped_star.shape[1] / cropped_star.shape[0]
         coef = coef / 1.30882352 + 0.21568627
         return int(round(coef))
 
     def to_gray(self, text_img):
-        text_img = np.array(text_img)
+        text_img = np.asarray(text_img)
         if len(text_img.shape) > 2:
-            text_img = (text_img[..., :3] @ [[[0.299], [0.587], [0.114]]])[:, :, 0]
+            return text_img[..., :3] @ np.array([0.299, 0.587, 0.114], np.float32)
         return np.array(text_img, np.float32)
 
     def normalize(self, img, auto_inverse=True):
@@ -195,21 +389,48 @@ class OCR:
         result = self.pad_to_width(result)
         return result
 
-    def decode(self, pred):
-        input_len = np.ones(pred.shape[0]) * pred.shape[1]
-        # Use greedy search. For complex tasks, you can use beam search
-        results = ctc_decode(pred, input_length=input_len, greedy=True)[0][0][:, :self.max_length]
-        # Iterate over the results and get back the text
-        output_text = []
-
-        for res in results:
-            res = self.num_to_char(res)
-            res = reduce_join(res)
-            res = res.numpy().decode("utf-8")
-            output_text.append(res)
+    def preprocess_into(self, text_img, out):
+        '''
+        the same as out[:] = preprocess(text_img).T, resized with NumPy and padded in place
+        '''
+        result = self.to_gray(text_img)
+        result = self.normalize(result, True)
+        result = self.binarization(result)
+        result = self.crop(result, tol=0)
+
+        result = resize_bilinear(result, int(result.shape[1] * 60 / result.shape[0]), 60)
+        result = self.resplice(result)
+
+        result = resize_bilinear(result, int(result.shape[1] * self.height / result.shape[0]), self.height)
+        width = min(result.shape[1], self.width)
+        out[:width] = result[:, :width].T
+        out[width:] = 0
+
+    def decode(self, pred, return_probabilities=False, fields=None):
+        '''
+        greedy CTC decoding of the model output, returns the texts
+        and, with return_probabilities, the probability of each character of every text
+        fields: field of every line, lines of a field with a lexicon are decoded against it; the probabilities of
+                their characters are capped by the score of the word (see ctc.lexicon_decode), so the confidence
+                of a line drops when its best valid word is a poor fit
+        '''
+        output_text, probabilities = greedy_decode(pred, self.char_table, self.max_length)
+        for field, lexicon in self.lexicons.items():
+            rows = [i for i, f in enumerate(fields or []) if f == field]
+            if rows:
+                words, word_probabilities, scores = lexicon_decode(np.asarray(pred)[rows], lexicon)
+                for i, word, p, score in zip(rows, words, word_probabilities, scores):
+                    output_text[i] = word
+                    probabilities[i] = np.minimum(p, score)
+        if return_probabilities:
+            return output_text, probabilities
         return output_text
 
     def build_model(self, input_shape):
+        from tensorflow.keras.models import Model
+        from tensorflow.keras.layers import Input, Reshape, Dense, Dropout, Bidirectional, LSTM
+        from mobilenetv3 import MobileNetV3_Small
+
         input_img = Input(
             shape=(input_shape[0], input_shape[1], 1), name="image", dtype="float32"
         )
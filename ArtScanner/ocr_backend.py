@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class OnnxBackend:
+    '''
+    Runs an exported ONNX model (Tools/export_model.py) with ONNX Runtime on the CPU.
+    '''
+    name = 'onnx'
+
+    def __init__(self, path):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, x):
+        return self.session.run(None, {self.input_name: np.asarray(x, np.float32)})[0]
+
+
+class TFLiteBackend:
+    '''
+    Runs an exported TFLite model (Tools/export_model.py), float or int8 quantized with float input and output.
+    One interpreter is kept per thread and per batch size, so resizing the input happens once per size.
+    '''
+    name = 'tflite'
+
+    def __init__(self, path, threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.Interpreter = Interpreter
+        self.path = path
+        self.threads = threads
+        self.interpreters = threading.local()
+
+    def _interpreter(self, shape):
+        cache = getattr(self.interpreters, 'cache', None)
+        if cache is None:
+            cache = self.interpreters.cache = {}
+        if shape not in cache:
+            interpreter = self.Interpreter(model_path=self.path, num_threads=self.threads)
+            input_index = interpreter.get_input_details()[0]['index']
+            interpreter.resize_tensor_input(input_index, shape)
+            interpreter.allocate_tensors()
+            cache[shape] = (interpreter, input_index, interpreter.get_output_details()[0]['index'])
+        return cache[shape]
+
+    def predict(self, x):
+        x = np.asarray(x, np.float32)
+        interpreter, input_index, output_index = self._interpreter(x.shape)
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index).copy()
+
+
+class SavedModelBackend:
+    '''
+    Runs a SavedModel exported by Tools/export_model.py. Graph, weights and vocabulary are restored from the
+    directory, so the model is not rebuilt layer by layer and mobilenetv3.py is not needed.
+    '''
+    name = 'savedmodel'
+
+    def __init__(self, path):
+        import tensorflow as tf
+        self.model = tf.saved_model.load(path)
+        with open(os.path.join(path, 'assets.extra', 'vocabulary.json'), 'rb') as f:
+            self.characters = json.loads(f.read().decode('utf-8'))['characters']
+
+    def predict(self, x):
+        return self.model.infer(np.asarray(x, np.float32)).numpy()
+
+
+backends = {
+    'savedmodel': SavedModelBackend,
+    'onnx': OnnxBackend,
+    'tflite': TFLiteBackend,
+}
+
+
+def load_backend(path, backend=None):
+    '''
+    backend: 'keras', 'savedmodel', 'onnx' or 'tflite', None to choose by the file extension of path
+             (a directory is a SavedModel)
+    returns None for keras, the model is then built by OCR itself; raises ValueError for an unknown backend
+    '''
+    if backend is None:
+        backend = 'savedmodel' if os.path.isdir(path) else path.rsplit('.', 1)[-1].lower()
+        # keras weights (.h5, .hdf5) or any other file the model is built for
+        backend = backend if backend in backends else 'keras'
+    if backend == 'keras':
+        return None
+    if backend not in backends:
+        raise ValueError(f'unknown backend {backend}')
+    return backends[backend](path)
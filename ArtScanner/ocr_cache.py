@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def model_fingerprint(source, *parts):
+    '''
+    digest of the model files at source (a weights file or a SavedModel directory) and of parts (e.g. the characters),
+    identifying the model the lines of a cache were read by
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    paths = [source]
+    if source is not None and os.path.isdir(source):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names)
+    for path in paths:
+        digest.update(repr(path if path is None else os.path.basename(path)).encode('utf-8'))
+        if path is not None and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class OCRCache:
+    '''
+    LRU cache of recognized text lines, keyed by the field kind and a hash of the preprocessed line image.
+    The same line (e.g. a substat roll or a type name) is rendered with the same pixels on every artifact,
+    so it only has to go through the model once. Safe to share between OCR threads.
+    fingerprint: identifies the model (see model_fingerprint), save() stores it and load() skips files of other models
+    '''
+
+    def __init__(self, maxsize=20000, fingerprint=None):
+        self.maxsize = maxsize
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(field, line):
+        '''
+        field: field name, the substat lines share one kind
+        line: preprocessed line image with values in [0, 1], multiples of 1/255
+        '''
+        kind = 'subattr' if field.startswith('subattr_') else field
+        digest = hashlib.blake2b(np.rint(line * 255).astype(np.uint8).tobytes(), digest_size=16).hexdigest()
+        return f'{kind}:{digest}'
+
+    def get(self, key):
+        '''
+        returns the stored (text, character probabilities) of the line, None if it is not cached
+        '''
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def hitRate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def load(self, path):
+        '''
+        adds the lines stored by save() in an earlier scan, a missing or broken file, or one written for another
+        model (or before files recorded their model), is ignored
+        '''
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        except ValueError:
+            return
+        if not isinstance(data, dict) or data.get('fingerprint') != self.fingerprint or \
+                not isinstance(data.get('entries'), dict):
+            return
+        for key, value in data['entries'].items():
+            # malformed entries are skipped
+            if isinstance(value, list) and len(value) == 2:
+                self.put(key, tuple(value))
+
+    def save(self, path):
+        with self.lock:
+            s = json.dumps({'fingerprint': self.fingerprint, 'entries': self.entries}, ensure_ascii=False)
+        with open(path, 'wb') as f:
+            f.write(s.encode('utf-8'))
@@ -0,0 +1,151 @@
+import importlib
+import itertools
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# seconds between checks that the workers are still alive while waiting for a result
+POLL_INTERVAL = 1.0
+
+
+def _work(module_name, model_kwargs, shm_name, slot_shape, tasks, results):
+    '''
+    worker process: holds one OCR model and recognizes the panels of the slots named by each task
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray(slot_shape, np.uint8, buffer=shm.buf)
+    try:
+        model = importlib.import_module(module_name).OCR(**model_kwargs)
+        model.warmup()
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, scale_ratio, items = task
+            try:
+                model.setScaleRatio(scale_ratio)
+                results.put((task_id, model.detect_info_batch([slots[i, :h, :w] for i, h, w in items]), None))
+            except Exception as e:
+                results.put((task_id, None, repr(e)))
+    except Exception as e:
+        # the model could not be loaded, fail every task this worker takes
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            results.put((task[0], None, repr(e)))
+    finally:
+        del slots
+        shm.close()
+
+
+class OCRPool:
+    '''
+    OCR in worker processes, each holding its own model, with the same detect_info_batch as OCR.
+    Panels are copied into slots of one shared memory block and only slot numbers go through the task queue,
+    so frames are never pickled. detect_info_batch may be called from several threads (e.g. the workers of a
+    ScanPipeline), every call gets the results of its own panels in order. Once a worker process dies the pool is
+    broken and every further call raises.
+    module_name: 'ocr' or 'ocr_EN', model_kwargs: arguments of its OCR
+    panel_shape: largest (height, width, 3) of a panel
+    '''
+
+    def __init__(self, module_name, model_kwargs, workers=2, panel_shape=(720, 480, 3), slots=None):
+        context = multiprocessing.get_context('spawn')
+        self.n_slots = slots or workers * 8
+        self.slot_shape = (self.n_slots, *panel_shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.slot_shape)))
+        self.slots = np.ndarray(self.slot_shape, np.uint8, buffer=self.shm.buf)
+        self.free = list(range(self.n_slots))
+        self.free_changed = threading.Condition()
+        self.scale_ratio = 1
+        self.task_ids = itertools.count()
+        self.waiting = {}
+        self.broken = None
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.processes = [context.Process(target=_work, daemon=True,
+                                          args=(module_name, model_kwargs, self.shm.name, self.slot_shape,
+                                                self.tasks, self.results))
+                          for _ in range(workers)]
+        for process in self.processes:
+            process.start()
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def setScaleRatio(self, scaleRatio):
+        self.scale_ratio = scaleRatio
+
+    def detect_info(self, art_img):
+        return self.detect_info_batch([art_img])[0]
+
+    def detect_info_batch(self, art_imgs):
+        results = []
+        art_imgs = [np.asarray(i) for i in art_imgs]
+        # a call never holds more than half of the slots, so concurrent calls cannot starve each other
+        chunk = max(1, self.n_slots // 2)
+        for start in range(0, len(art_imgs), chunk):
+            results += self._run(art_imgs[start:start + chunk])
+        return results
+
+    def _run(self, art_imgs):
+        with self.free_changed:
+            self.free_changed.wait_for(lambda: self.broken is not None or len(self.free) >= len(art_imgs))
+            if self.broken is not None:
+                raise RuntimeError(self.broken)
+            slots = [self.free.pop() for _ in art_imgs]
+        try:
+            items = []
+            for slot, art_img in zip(slots, art_imgs):
+                h, w = art_img.shape[:2]
+                self.slots[slot, :h, :w] = art_img[..., :3]
+                items.append((slot, h, w))
+            task_id = next(self.task_ids)
+            done = threading.Event()
+            self.waiting[task_id] = [done, None, None]
+            self.tasks.put((task_id, self.scale_ratio, items))
+            # a worker killed (e.g. out of memory) never answers, fail the scan instead of waiting forever
+            while not done.wait(POLL_INTERVAL):
+                dead = [process.exitcode for process in self.processes if not process.is_alive()]
+                if dead and not done.is_set():
+                    self.waiting.pop(task_id)
+                    with self.free_changed:
+                        self.broken = f'OCR worker exited with code {dead[0]}'
+                        self.free_changed.notify_all()
+                    # a live worker may still be recognizing the panels of the task, its slots are never reused
+                    slots = []
+                    raise RuntimeError(self.broken)
+            _, result, error = self.waiting.pop(task_id)
+        finally:
+            with self.free_changed:
+                self.free += slots
+                self.free_changed.notify_all()
+        if error is not None:
+            raise RuntimeError(f'OCR worker failed: {error}')
+        return result
+
+    def _collect(self):
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            task_id, result, error = message
+            waiting = self.waiting.get(task_id)
+            if waiting is None:
+                # the caller gave up on it
+                continue
+            waiting[1:] = result, error
+            waiting[0].set()
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.results.put(None)
+        self.collector.join()
+        del self.slots
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,94 @@
+import queue
+import threading
+
+
+class ScanPipeline:
+    '''
+    Runs process(item) on worker threads while the scanner keeps clicking and capturing.
+    submit() blocks while maxsize items are waiting to be processed (back-pressure), and
+    deliver(result) is called one result at a time in submission order, on the worker that completed it.
+    The first exception raised by process or deliver is re-raised by the next submit(), flush() or close().
+    batch_size: if above 1, process takes a list of the items already waiting (up to batch_size)
+                and returns a list of results
+    '''
+
+    def __init__(self, process, deliver, workers=1, maxsize=4, batch_size=1):
+        self.process = process
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.queue = queue.Queue(max(maxsize, batch_size))
+        self.lock = threading.Lock()
+        self.delivered_changed = threading.Condition(self.lock)
+        self.finished = {}
+        self.submitted = 0
+        self.delivered = 0
+        self.error = None
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, item):
+        self._raiseError()
+        self.queue.put((self.submitted, item))
+        self.submitted += 1
+
+    def flush(self):
+        '''
+        waits until every submitted item has been delivered, the workers keep running
+        '''
+        with self.lock:
+            self.delivered_changed.wait_for(lambda: self.delivered == self.submitted)
+        self._raiseError()
+
+    def close(self):
+        '''
+        waits until every submitted item has been delivered and stops the workers
+        '''
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self._raiseError()
+
+    def _raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _work(self):
+        stopping = False
+        while not stopping:
+            job = self.queue.get()
+            if job is None:
+                break
+            jobs = [job]
+            while len(jobs) < self.batch_size:
+                try:
+                    job = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+            try:
+                if self.batch_size > 1:
+                    results = [(True, i) for i in self.process([item for _, item in jobs])]
+                else:
+                    results = [(True, self.process(jobs[0][1]))]
+            except Exception as e:
+                results = [(False, e)] * len(jobs)
+            with self.lock:
+                for (index, _), result in zip(jobs, results):
+                    self.finished[index] = result
+                while self.delivered in self.finished:
+                    ok, result = self.finished.pop(self.delivered)
+                    self.delivered += 1
+                    try:
+                        if not ok:
+                            raise result
+                        self.deliver(result)
+                    except Exception as e:
+                        if self.error is None:
+                            self.error = e
+                self.delivered_changed.notify_all()
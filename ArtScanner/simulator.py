@@ -0,0 +1,334 @@
+'''
+Headless stand-in for the game window, so ArtScannerLogic can be benchmarked and regression-tested without Windows.
+
+GameSimulator renders a synthetic artifact bag (inventory grid and info panel) using the GameInfo geometry of the
+configured resolution, reacts to mouse move/click/wheel events after a configurable latency and scroll animation,
+and replaces the win32gui and mouse modules while installed.
+
+    python simulator.py --width 1920 --height 1080 --artifacts 300
+'''
+import argparse
+import math
+import random
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import ArtsInfo
+from capture import CaptureBackend, CaptureSession
+from ocr import Config
+
+BACKGROUND_COLOR = (59, 66, 85)
+TILE_COLORS = {1: (114, 119, 138), 2: (42, 143, 114), 3: (81, 128, 204), 4: (161, 86, 224), 5: (188, 105, 50)}
+LABEL_COLOR = (233, 229, 220)
+FRAME_COLOR = (255, 255, 255)
+PANEL_COLOR = (236, 229, 216)
+SUBATTR_COLOR = (73, 83, 102)
+# text boxes of the info panel at 2560x1440
+PANEL_LAYOUT = {key[:-len('_coords')]: value for key, value in vars(Config).items() if key.endswith('_coords')}
+
+
+def randomInventory(n, seed=0):
+    rng = random.Random(seed)
+    result = []
+    for _ in range(n):
+        setid = rng.randrange(len(ArtsInfo.ArtNames))
+        name = rng.choice(ArtsInfo.ArtNames[setid])
+        star = rng.choice([3, 4, 5, 5, 5])
+        level = rng.randint(0, ArtsInfo.RarityToMaxLvs[star - 1])
+        main_attr = rng.choice(list(ArtsInfo.MainAttrValue[star].keys()))
+        values = ArtsInfo.MainAttrValue[star][main_attr]
+        subattrs = rng.sample(list(ArtsInfo.SubAttrNames.keys()), rng.randint(1, 4))
+        result.append({
+            'name': name,
+            'type': rng.choice(ArtsInfo.TypeNames),
+            'star': star,
+            'level': f'+{level}',
+            'main_attr_name': ArtsInfo.MainAttrNames[main_attr],
+            'main_attr_value': ArtsInfo.Formats[main_attr].format(values[min(level, len(values) - 1)]),
+            **{f'subattr_{i + 1}': ArtsInfo.SubAttrNames[k] + '+' + ArtsInfo.Formats[k].format(
+                rng.uniform(0.02, 0.1) if ArtsInfo.Formats[k].endswith('%}') else rng.randint(10, 60))
+               for i, k in enumerate(subattrs)}
+        })
+    return result
+
+
+class SimulatorBackend(CaptureBackend):
+    pixelFormat = 'RGB'
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def windowRect(self):
+        return (*self.simulator.origin, self.simulator.origin[0] + self.simulator.w,
+                self.simulator.origin[1] + self.simulator.h)
+
+    def clientOrigin(self):
+        return self.simulator.origin
+
+    def grab(self, left, top, width, height):
+        return self.simulator.render(left - self.simulator.origin[0], top - self.simulator.origin[1], width, height)
+
+
+class GameSimulator:
+    '''
+    latency: seconds between a mouse event and the game reacting to it
+    animation: seconds a wheel step takes to scroll
+    wheel_pixels: pixels scrolled by one wheel step at 2560x1440, a row is 233.56 pixels
+    '''
+
+    def __init__(self, width=1920, height=1080, n_artifacts=200, latency=0.03, animation=0., wheel_pixels=29,
+                 origin=(0, 0), seed=0):
+        self.w, self.h = width, height
+        self.origin = tuple(origin)
+        self.hwnd = 0x5157
+        self.latency = latency
+        self.animation = animation
+        self.artifacts = randomInventory(n_artifacts, seed)
+        self.lock = threading.RLock()
+        self.cursor = (0, 0)
+        self.clicks = []
+        self.wheels = []
+        self.scroll_base = 0
+        self.selected = None
+        self.middle_click_callbacks = []
+        self._panels = {}
+
+        self.win32gui = self._fakeWin32gui()
+        self.mouse = self._fakeMouse()
+        self.install()
+
+        from art_scanner_logic import GameInfo
+        self.game_info = GameInfo(self.hwnd)
+        self.game_info.calculateCoordinates()
+        gi = self.game_info
+        self.wheel_pixels = wheel_pixels * gi.scale_ratio
+        self.row_pitch = gi.art_height + gi.art_gap_y
+        self.total_rows = int(math.ceil(len(self.artifacts) / gi.art_cols))
+        self.max_scroll = max(0., (self.total_rows - gi.art_rows) * self.row_pitch)
+        self.view_top = gi.first_art_y - gi.art_gap_y / 2
+        self.view_bottom = gi.first_art_y + gi.art_rows * self.row_pitch - gi.art_gap_y / 2
+        self.font = ImageFont.load_default()
+
+    # ---- stand-ins for win32gui and mouse ----
+
+    def _fakeWin32gui(self):
+        module = types.ModuleType('win32gui')
+        module.GetClientRect = lambda hwnd: (0, 0, self.w, self.h)
+        module.GetWindowRect = lambda hwnd: (*self.origin, self.origin[0] + self.w, self.origin[1] + self.h)
+        module.ClientToScreen = lambda hwnd, point: (point[0] + self.origin[0], point[1] + self.origin[1])
+        module.FindWindow = lambda cls, name: self.hwnd
+        module.IsWindowVisible = lambda hwnd: True
+        module.GetWindowText = lambda hwnd: '原神'
+        module.ShowWindow = lambda hwnd, cmd: None
+        module.SetForegroundWindow = lambda hwnd: None
+        return module
+
+    def _fakeMouse(self):
+        module = types.ModuleType('mouse')
+        module.move = self.move
+        module.click = self.click
+        module.wheel = self.wheel
+        module.on_middle_click = lambda callback, args=(): self.middle_click_callbacks.append((callback, args))
+        module.get_position = lambda: self.cursor
+        return module
+
+    def install(self):
+        '''
+        replaces win32gui and mouse, also in modules that have already imported them
+        '''
+        for name in ['win32gui', 'mouse']:
+            previous = sys.modules.get(name)
+            sys.modules[name] = getattr(self, name)
+            if previous is None:
+                continue
+            for module in list(sys.modules.values()):
+                if getattr(module, name, None) is previous:
+                    setattr(module, name, getattr(self, name))
+
+    def captureSession(self):
+        return CaptureSession(SimulatorBackend(self))
+
+    # ---- input ----
+
+    def move(self, x, y, absolute=True, duration=0):
+        with self.lock:
+            self.cursor = (x - self.origin[0], y - self.origin[1])
+
+    def click(self, button='left'):
+        with self.lock:
+            self.clicks.append((time.time() + self.latency, self.cursor))
+
+    def wheel(self, delta=1):
+        with self.lock:
+            self.wheels.append((time.time() + self.latency, -delta * self.wheel_pixels))
+
+    def middleClick(self):
+        for callback, args in self.middle_click_callbacks:
+            callback(*args)
+
+    # ---- state ----
+
+    def _update(self, now):
+        # fold finished scroll animations into the base offset, clamped like the game does
+        while len(self.wheels) > 0 and self.wheels[0][0] + self.animation <= now:
+            self.scroll_base = min(max(self.scroll_base + self.wheels.pop(0)[1], 0), self.max_scroll)
+        while len(self.clicks) > 0 and self.clicks[0][0] <= now:
+            index = self.artifactAt(*self.clicks.pop(0)[1], self.scrollOffset(now))
+            if index is not None:
+                self.selected = index
+
+    def scrollOffset(self, now):
+        offset = self.scroll_base + sum(
+            d * min(max((now - t) / self.animation if self.animation > 0 else 1, 0), 1) for t, d in self.wheels)
+        return min(max(offset, 0), self.max_scroll)
+
+    def tileRect(self, index, offset):
+        gi = self.game_info
+        row, col = divmod(index, gi.art_cols)
+        left = gi.first_art_x + (gi.art_width + gi.art_gap_x) * col
+        top = gi.first_art_y + self.row_pitch * row - offset
+        return left, top, left + gi.art_width, top + gi.art_height
+
+    def artifactAt(self, x, y, offset):
+        gi = self.game_info
+        if not self.view_top <= y < self.view_bottom:
+            return None
+        col = int((x - gi.first_art_x) // (gi.art_width + gi.art_gap_x))
+        row = int((y + offset - gi.first_art_y) // self.row_pitch)
+        index = row * gi.art_cols + col
+        if not 0 <= col < gi.art_cols or index >= len(self.artifacts):
+            return None
+        left, top, right, bottom = self.tileRect(index, offset)
+        return index if left <= x < right and top <= y < bottom else None
+
+    # ---- rendering ----
+
+    def _fill(self, out, region, rect, color, clip=None):
+        left, top = region
+        x0, y0, x1, y1 = rect
+        if clip is not None:
+            y0, y1 = max(y0, clip[0]), min(y1, clip[1])
+        x0, x1 = max(int(round(x0)) - left, 0), min(int(round(x1)) - left, out.shape[1])
+        y0, y1 = max(int(round(y0)) - top, 0), min(int(round(y1)) - top, out.shape[0])
+        if x0 < x1 and y0 < y1:
+            out[y0:y1, x0:x1] = color
+
+    def panel(self, index):
+        '''
+        info panel of an artifact, the index is encoded in the first pixels of the top row
+        '''
+        if index not in self._panels:
+            if len(self._panels) > 16:
+                self._panels.clear()
+            gi = self.game_info
+            art = self.artifacts[index]
+            img = Image.new('RGB', (int(round(gi.art_info_width)), int(round(gi.art_info_height))), PANEL_COLOR)
+            draw = ImageDraw.Draw(img)
+            for key, coords in PANEL_LAYOUT.items():
+                if key != 'star' and key in art:
+                    draw.text((coords[0] * gi.scale_ratio, coords[1] * gi.scale_ratio), art[key],
+                              SUBATTR_COLOR if key.startswith('subattr') else (0, 0, 0), font=self.font)
+            x0, y0 = [i * gi.scale_ratio for i in PANEL_LAYOUT['star'][:2]]
+            draw.rectangle((x0, y0, x0 + 27 * art['star'] * gi.scale_ratio, y0 + 27 * gi.scale_ratio),
+                           fill=(255, 204, 50))
+            panel = np.array(img)
+            panel[0, 0:3] = [[index & 255, index >> 8 & 255, 90]] * 3
+            self._panels[index] = panel
+        return self._panels[index]
+
+    @staticmethod
+    def decodeIndex(art_img):
+        pix = np.asarray(art_img)[0, 1]
+        return int(pix[0]) + (int(pix[1]) << 8)
+
+    def render(self, left, top, width, height):
+        '''
+        renders the given part of the client area at the current time
+        '''
+        gi = self.game_info
+        with self.lock:
+            now = time.time()
+            self._update(now)
+            offset = self.scrollOffset(now)
+            selected = self.selected
+        out = np.empty((height, width, 3), np.uint8)
+        out[:] = BACKGROUND_COLOR
+        region = (left, top)
+        clip = (self.view_top, self.view_bottom)
+        first_row = max(int((max(top, self.view_top) + offset - gi.first_art_y) // self.row_pitch) - 1, 0)
+        last_row = int((min(top + height, self.view_bottom) + offset - gi.first_art_y) // self.row_pitch) + 1
+        for row in range(first_row, min(last_row, self.total_rows - 1) + 1):
+            for col in range(gi.art_cols):
+                index = row * gi.art_cols + col
+                if index >= len(self.artifacts):
+                    break
+                x0, y0, x1, y1 = self.tileRect(index, offset)
+                e = gi.art_expand + 1
+                if x1 + e < left or x0 - e > left + width or y1 + e < top or y0 - e > top + height:
+                    continue
+                if index == selected:
+                    self._fill(out, region, (x0 - gi.art_expand, y0 - gi.art_expand, x1 + gi.art_expand,
+                                             y1 + gi.art_expand), FRAME_COLOR, clip)
+                label_top = y0 + gi.art_height * 0.8
+                self._fill(out, region, (x0, y0, x1, label_top), TILE_COLORS[self.artifacts[index]['star']], clip)
+                self._fill(out, region, (x0, label_top, x1, y1), LABEL_COLOR, clip)
+        if selected is not None:
+            panel = self.panel(selected)
+            x0, y0 = int(round(gi.art_info_left)) - left, int(round(gi.art_info_top)) - top
+            sx0, sy0 = max(-x0, 0), max(-y0, 0)
+            sx1, sy1 = min(width - x0, panel.shape[1]), min(height - y0, panel.shape[0])
+            if sx0 < sx1 and sy0 < sy1:
+                out[y0 + sy0:y0 + sy1, x0 + sx0:x0 + sx1] = panel[sy0:sy1, sx0:sx1]
+        return out
+
+
+def runScan(scanner, game_info, callback, interval=0.05):
+    '''
+    the scanning loop of UIMain.Worker.scanArts
+    '''
+    start_row = 0
+    while True:
+        if scanner.stopped or not scanner.scanRows(rows=range(start_row, game_info.art_rows),
+                                                   callback=callback) or start_row != 0:
+            break
+        start_row = game_info.art_rows - scanner.scrollToRow(game_info.art_rows, max_scrolls=20,
+                                                             extra_scroll=int(game_info.art_rows > 5),
+                                                             interval=interval)
+        if start_row == game_info.art_rows:
+            break
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark ArtScannerLogic against the headless game simulator')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--artifacts', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.03)
+    parser.add_argument('--animation', type=float, default=0.)
+    parser.add_argument('--delay', type=float, default=0.05, help='scroll detection interval')
+    args = parser.parse_args()
+
+    simulator = GameSimulator(args.width, args.height, args.artifacts, latency=args.latency,
+                              animation=args.animation)
+    from art_scanner_logic import ArtScannerLogic
+
+    scanner = ArtScannerLogic(simulator.game_info, capture=simulator.captureSession())
+    scanned = []
+    print(f'{args.width}x{args.height}: {simulator.game_info.art_rows} rows, {simulator.game_info.art_cols} columns')
+    start = time.time()
+    scanner.alignFirstRow()
+    runScan(scanner, simulator.game_info, lambda art_img: scanned.append(simulator.decodeIndex(art_img)),
+            interval=args.delay)
+    elapsed = time.time() - start
+    scanner.close()
+
+    missing = sorted(set(range(len(simulator.artifacts))) - set(scanned))
+    print(f'scanned {len(scanned)} artifacts in {elapsed:.2f}s, {len(scanned) / elapsed:.2f} artifacts/s, '
+          f'avg response time {scanner.avg_response_time * 1000:.0f}ms')
+    print(f'duplicated: {len(scanned) - len(set(scanned))}, missing: {len(missing)}'
+          + (f' (first {missing[:10]})' if missing else ''))
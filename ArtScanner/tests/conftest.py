@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of ArtScanner are imported by their flat names, as the scanners do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
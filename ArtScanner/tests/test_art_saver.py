@@ -0,0 +1,47 @@
+import art_saver
+
+
+def artifact(crit_rate, level=0):
+    '''
+    a +level 5 star artifact with one roll of each substat, crit rate as read
+    '''
+    art = art_saver.Artifact.__new__(art_saver.Artifact)
+    art.rarity = 5
+    art.level = level
+    art.substats = [art_saver.ArtifactStat(name, value) for name, value in
+                    [('暴击率', crit_rate), ('攻击力', '5.8%'), ('防御力', '23'), ('元素精通', '23')]]
+    return art
+
+
+def test_substat_upgrades_match_the_level():
+    # 7.0% is two rolls of 3.5%, one more than the four rolls of a new artifact
+    assert artifact('7.0%', level=4).calculate_substat_upgrades()
+    assert not artifact('7.0%', level=0).calculate_substat_upgrades()
+
+
+def test_a_valid_substat_is_kept():
+    art = artifact('3.5%')
+    art.snap_substats()
+    assert [i.raw for i in art.substats] == [35, 58, 23, 23]
+
+
+def test_a_single_valid_candidate_is_snapped():
+    art = artifact('35%')
+    art.snap_substats()
+    assert art.substats[0].raw == 35
+    assert art.calculate_substat_upgrades()
+
+
+def test_an_ambiguous_substat_is_kept_as_read():
+    # 3.1%, 3.5% and 3.9% all make the artifact valid
+    art = artifact('3.4%')
+    art.snap_substats()
+    assert art.substats[0].raw == 34
+    assert not art.calculate_substat_upgrades()
+
+
+def test_no_snapping_past_snap_limit(monkeypatch):
+    monkeypatch.setattr(art_saver, 'SNAP_LIMIT', 0)
+    art = artifact('35%')
+    art.snap_substats()
+    assert art.substats[0].raw == 350
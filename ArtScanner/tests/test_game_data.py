@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import game_data
+
+
+def test_substat_roll_counts_of_a_single_roll():
+    assert game_data.substat_roll_counts('FIGHT_PROP_CRITICAL', 5, 35) == [1]
+
+
+def test_substat_roll_counts_lists_every_number_of_rolls_showing_a_value():
+    # 11.7% is three rolls of 3.9% or four lower rolls
+    assert game_data.substat_roll_counts('FIGHT_PROP_CRITICAL', 5, 117) == [3, 4]
+
+
+def test_substat_roll_counts_within_max_rolls():
+    assert game_data.substat_roll_counts('FIGHT_PROP_CRITICAL', 5, 70) == [2]
+    assert game_data.substat_roll_counts('FIGHT_PROP_CRITICAL', 5, 70, max_rolls=1) == []
+
+
+def test_substat_roll_counts_of_a_value_no_roll_shows():
+    assert game_data.substat_roll_counts('FIGHT_PROP_CRITICAL', 5, 34) == []
+
+
+def test_snap_substat_keeps_a_legal_value():
+    assert game_data.snap_substat('FIGHT_PROP_CRITICAL', 5, 35, 1) == [35]
+
+
+def test_snap_substat_restores_a_dropped_decimal_point():
+    # 3.5% read as 35%, 350 in tenths of a percent
+    assert game_data.snap_substat('FIGHT_PROP_CRITICAL', 5, 350, 1) == [35]
+
+
+def test_snap_substat_returns_every_value_a_digit_edit_away_nearest_first():
+    # 3.4% is no single roll, 3.1%, 3.5% and 3.9% are one digit away
+    assert game_data.snap_substat('FIGHT_PROP_CRITICAL', 5, 34, 1) == [35, 31, 39]
+
+
+def test_snap_substat_only_returns_values_within_max_rolls():
+    assert all(raw in game_data.substat_values('FIGHT_PROP_CRITICAL', 5, 1)
+               for raw in game_data.snap_substat('FIGHT_PROP_CRITICAL', 5, 34, 1))
+    assert game_data.snap_substat('FIGHT_PROP_CRITICAL', 5, 940, 1) == []
+
+
+def test_main_stat_levels_stop_at_the_max_level_of_the_rarity():
+    # the level config lists 4 star main stats up to +20, 146 is what a 4 star shows at +17
+    assert game_data.main_stat_levels('FIGHT_PROP_ELEMENT_MASTERY', 4, 146) == ()
+    assert game_data.main_stat_raw('FIGHT_PROP_ELEMENT_MASTERY', 4, 17) is None
+
+
+def test_infer_level_keeps_a_level_the_rarity_can_reach():
+    # a misread main stat of a 4 star read at +16
+    assert game_data.infer_level('FIGHT_PROP_ELEMENT_MASTERY', 4, 146, 16) == 16
+    assert game_data.infer_level('FIGHT_PROP_ELEMENT_MASTERY', 4, 146, None) is None
+
+
+def test_infer_level_replaces_an_unreadable_or_unreachable_level():
+    raw = game_data.main_stat_raw('FIGHT_PROP_ELEMENT_MASTERY', 4, 12)
+    assert game_data.infer_level('FIGHT_PROP_ELEMENT_MASTERY', 4, raw, None) == 12
+    assert game_data.infer_level('FIGHT_PROP_ELEMENT_MASTERY', 4, raw, 18) == 12
+
+
+def test_build_writes_the_cache_keyed_by_the_configs(tmp_path):
+    path = tmp_path / 'game_data.json'
+    data = game_data.build(str(path))
+    assert json.loads(path.read_text())['source'] == data['source'] == game_data._digest(
+        [game_data.AFFIX_CONFIG, game_data.LEVEL_CONFIG])
+
+
+def test_tables_are_loaded_from_the_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'game_data.json'
+    game_data.build(str(path))
+    monkeypatch.setattr(game_data, 'CACHE', str(path))
+    monkeypatch.setattr(game_data, '_tables', None)
+    monkeypatch.setattr(game_data, 'compile_tables', lambda: pytest.fail('compiled although the cache is fresh'))
+    assert game_data.tables()['roll_tables']['FIGHT_PROP_CRITICAL'][5][35] == (1,)
+
+
+def test_a_stale_cache_is_rebuilt(tmp_path, monkeypatch):
+    path = tmp_path / 'game_data.json'
+    path.write_text(json.dumps({'source': 'stale'}))
+    monkeypatch.setattr(game_data, 'CACHE', str(path))
+    monkeypatch.setattr(game_data, '_tables', None)
+    assert game_data.tables()['main_stat_raw']['FIGHT_PROP_CRITICAL'][5][0] == 47
+    assert json.loads(path.read_text())['source'] != 'stale'
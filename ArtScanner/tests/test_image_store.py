@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+from PIL import Image
+
+import image_store
+
+
+class Unwritable:
+    '''
+    an image that fails to be saved
+    '''
+    mode = 'RGB'
+    size = (1, 1)
+
+    def tobytes(self):
+        return b'unwritable'
+
+    def save(self, *args, **kwargs):
+        raise OSError('disk full')
+
+
+def wait_written(store):
+    while store.pending:
+        time.sleep(0.01)
+
+
+def test_an_image_is_written_once(tmp_path):
+    store = image_store.ImageStore(str(tmp_path))
+    image = Image.new('RGB', (4, 4), (1, 2, 3))
+    ref = store.put(image)
+    assert store.put(image.copy()) == ref
+    store.close()
+    assert os.listdir(tmp_path) == [ref + '.png']
+    assert store.get(ref).tobytes() == image.tobytes()
+
+
+def test_a_failed_write_is_reported_once(tmp_path):
+    store = image_store.ImageStore(str(tmp_path))
+    store.put(Unwritable())
+    wait_written(store)
+    image = Image.new('RGB', (4, 4))
+    with pytest.raises(OSError):
+        store.put(image)
+    ref = store.put(image)
+    store.close()
+    assert os.path.exists(store.path(ref))
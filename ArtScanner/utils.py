@@ -6,9 +6,9 @@ import win32gui
 import win32process
 from PIL import Image
 from mss import mss
-import Levenshtein
-import ArtsInfo
+import matcher
 import logging
+from game_data import decode_value as decodeValue
 
 logger = logging.getLogger()
 logHandler = logging.FileHandler("./Amenoma.log", encoding='utf-8')
@@ -70,80 +70,70 @@ def captureWindow(hwnd, local_rect=None):
         [screen_rect[1], screen_rect[0], screen_rect[2] - screen_rect[0], screen_rect[3] - screen_rect[1]])
 
 
-def decodeValue(v):
-    if type(v) != str:
-        return v
-    if "%" in v:
-        return float(v[:-1]) / 100
+def log_correction(text: str, corrected: str, distance: int):
+    if distance == 0:
+        pass
+    elif distance <= (len(text) // 3):
+        logger.info(f"Corrected attribute from [{text}] to [{corrected}] with distance {distance}")
     else:
-        return int(v.replace(',', '').replace('+', ''))
+        logger.warning(f"Corrected attribute from [{text}] to [{corrected}] with distance {distance}")
 
 
 def attr_auto_correct(attr: str) -> str:
-    corr_name = ''
-    dis = 10000000
-    for n in ArtsInfo.MainAttrNames.values():
-        ndis = Levenshtein.distance(attr, n)
-        if ndis < dis:
-            dis = ndis
-            corr_name = n
-    if dis == 0:
-        pass
-    elif dis <= (len(attr) // 3):
-        logger.info(f"Corrected attribute from [{attr}] to [{corr_name}] with distance {dis}")
-    else:
-        logger.warning(f"Corrected attribute from [{attr}] to [{corr_name}] with distance {dis}")
+    corr_name, dis = matcher.attr_matcher.match(attr)
+    log_correction(attr, corr_name, dis)
     return corr_name
 
 
+def art_auto_correct(name: str) -> tuple:
+    '''
+    returns the corrected name, its set id and its slot (index of ArtsInfo.TypeNames)
+    '''
+    (corr_name, setid, slot), dis = matcher.name_matcher.match(name)
+    log_correction(name, corr_name, dis)
+    return corr_name, setid, slot
+
+
 def name_auto_correct(name: str) -> str:
-    corr_name = ""
-    dis = 10000000
-    for arts in ArtsInfo.ArtNames:
-        for rname in arts:
-            ndis = Levenshtein.distance(name, rname)
-            if ndis < dis:
-                corr_name = rname
-                dis = ndis
-    if dis == 0:
-        pass
-    elif dis <= (len(name) // 3):
-        logger.info(f"Corrected attribute from [{name}] to [{corr_name}] with distance {dis}")
-    else:
-        logger.warning(f"Corrected attribute from [{name}] to [{corr_name}] with distance {dis}")
-    return corr_name
+    return art_auto_correct(name)[0]
+
+
+def art_resolve(name: str, type: str, main_attr_name: str, confident=()) -> dict:
+    '''
+    corrects name, type and main stat together, returns their corrected values with the set id and the slot
+    confident: the fields the OCR is confident about, they pin the slot when they are known words
+    '''
+    resolved, corrections = matcher.resolver.resolve(name, type, main_attr_name, confident)
+    for field, text, corrected in corrections:
+        logger.warning(f"Corrected {field} from [{text}] to [{corrected}] with the other fields")
+    return resolved
 
 
 def attr_auto_correct_EN(attr: str) -> str:
-    corr_name = ''
-    dis = 10000000
-    for n in ArtsInfo.MainAttrNames_EN.values():
-        ndis = Levenshtein.distance(attr, n)
-        if ndis < dis:
-            dis = ndis
-            corr_name = n
-    if dis == 0:
-        pass
-    elif dis <= (len(attr) // 3):
-        logger.info(f"Corrected attribute from [{attr}] to [{corr_name}] with distance {dis}")
-    else:
-        logger.warning(f"Corrected attribute from [{attr}] to [{corr_name}] with distance {dis}")
+    corr_name, dis = matcher.attr_matcher_EN.match(attr)
+    log_correction(attr, corr_name, dis)
     return corr_name
 
 
+def art_auto_correct_EN(name: str) -> tuple:
+    '''
+    returns the corrected name, its set id and its slot (index of ArtsInfo.TypeNames_EN)
+    '''
+    (corr_name, setid, slot), dis = matcher.name_matcher_EN.match(name)
+    log_correction(name, corr_name, dis)
+    return corr_name, setid, slot
+
+
 def name_auto_correct_EN(name: str) -> str:
-    corr_name = ""
-    dis = 10000000
-    for arts in ArtsInfo.ArtNames_EN:
-        for rname in arts:
-            ndis = Levenshtein.distance(name, rname)
-            if ndis < dis:
-                corr_name = rname
-                dis = ndis
-    if dis == 0:
-        pass
-    elif dis <= (len(name) // 3):
-        logger.info(f"Corrected attribute from [{name}] to [{corr_name}] with distance {dis}")
-    else:
-        logger.warning(f"Corrected attribute from [{name}] to [{corr_name}] with distance {dis}")
-    return corr_name
+    return art_auto_correct_EN(name)[0]
+
+
+def art_resolve_EN(name: str, type: str, main_attr_name: str, confident=()) -> dict:
+    '''
+    corrects name, type and main stat together, returns their corrected values with the set id and the slot
+    confident: the fields the OCR is confident about, they pin the slot when they are known words
+    '''
+    resolved, corrections = matcher.resolver_EN.resolve(name, type, main_attr_name, confident)
+    for field, text, corrected in corrections:
+        logger.warning(f"Corrected {field} from [{text}] to [{corrected}] with the other fields")
+    return resolved